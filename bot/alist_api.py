@@ -1,70 +1,232 @@
-
-import requests
-import logging
+import asyncio
+import base64
 import json
-import re
-from .system import get_admin_pass
+import logging
+import time
+import httpx
+from .system import get_admin_pass, read_admin_pass_file
 from .config import ALIST_PASSWORD, ALIST_TOKEN
+from .executor import run_blocking
+from .storage import data_path, atomic_write_json, read_json
 
 logger = logging.getLogger(__name__)
 
 ALIST_API_URL = "http://127.0.0.1:5244"
-_cached_token = None
 
-def get_token():
-    """获取或刷新 Alist Token"""
-    global _cached_token
-    
-    # 策略 0: 直接使用环境变量配置的 Token (最高优先级)
-    if ALIST_TOKEN:
-        return ALIST_TOKEN
-
-    if _cached_token: return _cached_token
-    
-    password = ALIST_PASSWORD
-    
-    # 策略 1: 自动获取密码
-    if not password:
-        raw_output = get_admin_pass()
-        if raw_output and "失败" not in raw_output:
-            if ":" in raw_output:
-                parts = raw_output.split(":")
-                if len(parts) > 1:
-                    password = parts[-1].strip()
-            if not password:
-                password = raw_output.strip()
-    
-    if not password:
-        logger.error("❌ 未配置 ALIST_PASSWORD 且无法自动获取密码")
-        return None
+# --- Token ---
+TOKEN_FILE = data_path("alist_token.json")
+TOKEN_TTL = 48 * 3600    # Alist 默认 Token 有效期，JWT 中带 exp 时以 exp 为准
+REFRESH_BEFORE = 3600    # 秒，过期前多久提前刷新
+
+# --- 连接池 ---
+# 全局共享一个 AsyncClient，保持 Keep-Alive，避免每次点击都重新握手
+_client = None
+
+# 各接口独立超时 (秒)
+ENDPOINT_TIMEOUTS = {
+    "/api/auth/login": 5,
+    "/api/fs/list": 15,
+    "/api/fs/get": 10,
+}
+DEFAULT_TIMEOUT = 10
+
+# 重试策略: 网络异常 / 5xx 时指数退避
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.3
+
+def _get_client():
+    """懒加载共享的 httpx.AsyncClient"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=ALIST_API_URL,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60),
+            timeout=DEFAULT_TIMEOUT,
+        )
+    return _client
+
+async def close_client():
+    """关闭连接池 (Application 退出时调用)"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
 
+async def _post(endpoint, payload, token=None):
+    """
+    发送 POST 请求到 Alist，带超时与重试
+    Returns:
+        解析后的 JSON 字典，失败时抛出最后一次异常
+    """
+    headers = {"Authorization": token} if token else {}
+    timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+    last_exc = None
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            r = await _get_client().post(endpoint, json=payload, headers=headers, timeout=timeout)
+            if r.status_code >= 500:
+                raise httpx.HTTPStatusError(f"HTTP {r.status_code}", request=r.request, response=r)
+            return r.json()
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            last_exc = e
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+    raise last_exc
+
+def _parse_admin_output(raw_output):
+    """从密码文件内容或 alist admin 输出中提取密码"""
+    if not raw_output or "失败" in raw_output: return None
+    password = None
+    if ":" in raw_output:
+        parts = raw_output.split(":")
+        if len(parts) > 1:
+            password = parts[-1].strip()
+    return password or raw_output.strip() or None
+
+def _jwt_expiry(token):
+    """读取 JWT 的 exp 字段，无法解析时返回 None"""
     try:
-        url = f"{ALIST_API_URL}/api/auth/login"
-        payload = {"username": "admin", "password": password}
-        
-        r = requests.post(url, json=payload, timeout=5)
-        data = r.json()
-        
-        if data.get("code") == 200:
-            _cached_token = data["data"]["token"]
-            return _cached_token
-        else:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+class TokenManager:
+    """
+    Alist Token 管理
+      - 并发刷新合并为一次登录 (asyncio.Lock)
+      - Token 与过期时间持久化到数据目录，重启后直接复用
+      - 过期前由定时任务提前刷新
+      - 请求路径只读取环境变量 / 密码文件，alist admin 子进程只在后台执行
+    """
+    def __init__(self, state_file=TOKEN_FILE):
+        self.state_file = state_file
+        self.token = None
+        self.expires_at = 0
+        self._password = ALIST_PASSWORD or None
+        self._lock = asyncio.Lock()
+        self._discovery = None  # 后台获取密码的任务
+        self._load()
+
+    def _load(self):
+        data = read_json(self.state_file, {})
+        if isinstance(data, dict) and data.get("token"):
+            self.token = data["token"]
+            self.expires_at = float(data.get("expires_at") or 0)
+
+    def _save(self):
+        try:
+            atomic_write_json(self.state_file, {"token": self.token, "expires_at": self.expires_at})
+        except Exception as e:
+            logger.warning(f"保存 Alist Token 失败: {e}")
+
+    def valid(self, margin=0):
+        return bool(self.token) and self.expires_at - margin > time.time()
+
+    async def _discover_password(self):
+        """后台执行 alist admin 获取密码 (可能耗时 10 秒)"""
+        try:
+            self._password = _parse_admin_output(await run_blocking(get_admin_pass)) or self._password
+        except Exception as e:
+            logger.warning(f"自动获取 Alist 密码失败: {e}")
+
+    async def _get_password(self):
+        """不阻塞在子进程上: 环境变量 / 已缓存 / 密码文件，都没有时转入后台获取"""
+        if self._password: return self._password
+        try:
+            self._password = _parse_admin_output(await run_blocking(read_admin_pass_file))
+        except Exception as e:
+            # 执行器繁忙 (ExecutorBusy) 等情况不应抛到 Handler，本次按未获取到处理
+            logger.warning(f"读取 Alist 密码文件失败: {e}")
+        if self._password: return self._password
+        if self._discovery is None or self._discovery.done():
+            self._discovery = asyncio.create_task(self._discover_password())
+        return None
+
+    async def _login(self):
+        password = await self._get_password()
+        if not password:
+            logger.error("❌ 未配置 ALIST_PASSWORD 且暂未获取到密码 (后台获取中)")
+            return None
+        try:
+            data = await _post("/api/auth/login", {"username": "admin", "password": password})
+        except Exception as e:
+            logger.error(f"Alist API 连接失败: {e}")
+            return None
+        if data.get("code") != 200:
             logger.error(f"Alist 登录失败: {data}")
+            # 密码可能已被修改，下次重新获取
+            if not ALIST_PASSWORD: self._password = None
             return None
-    except Exception as e:
-        logger.error(f"Alist API 连接失败: {e}")
-        return None
+        self.token = data["data"]["token"]
+        self.expires_at = _jwt_expiry(self.token) or time.time() + TOKEN_TTL
+        self._save()
+        logger.info("🔑 Alist Token 已刷新")
+        return self.token
+
+    async def get(self):
+        """获取有效 Token，并发调用只触发一次登录"""
+        if ALIST_TOKEN: return ALIST_TOKEN
+        if self.valid(): return self.token
+        async with self._lock:
+            if self.valid(): return self.token
+            return await self._login()
+
+    async def invalidate(self, bad_token):
+        """Token 被拒绝时作废; 只作废出错的那个，其他请求已刷新的新 Token 不受影响"""
+        if ALIST_TOKEN: return
+        async with self._lock:
+            if self.token == bad_token:
+                self.token = None
+                self.expires_at = 0
+                self._save()
+
+    async def refresh_if_needed(self):
+        """定时任务调用: 临近过期时提前刷新"""
+        if ALIST_TOKEN or self.valid(margin=REFRESH_BEFORE): return
+        async with self._lock:
+            if not self.valid(margin=REFRESH_BEFORE):
+                await self._login()
 
-def fetch_file_list(path="/", page=1, per_page=100):
-    """获取文件列表 (修复空文件夹崩溃问题)"""
-    global _cached_token
-    
-    token = get_token()
-    if not token: 
-        return None, "❌ 认证失败: 无法获取 Token"
+    async def warm_up(self):
+        """启动时在后台准备密码与 Token"""
+        if ALIST_TOKEN: return
+        if not self._password and not await self._get_password() and self._discovery:
+            await self._discovery
+        await self.refresh_if_needed()
 
-    url = f"{ALIST_API_URL}/api/fs/list"
-    headers = {"Authorization": token}
+token_manager = TokenManager()
+
+async def get_token():
+    """获取或刷新 Alist Token"""
+    return await token_manager.get()
+
+async def _authed_post(endpoint, payload):
+    """
+    带 Token 的请求: Token 被拒绝 (401/403) 时作废并重新登录，重试一次
+    Returns:
+        解析后的 JSON 字典，无法获取 Token 时返回 None；网络异常照常抛出
+    """
+    token = await get_token()
+    if not token: return None
+    data = await _post(endpoint, payload, token)
+    if data.get("code") in [401, 403] and not ALIST_TOKEN:
+        logger.info("Token 可能失效，尝试重新获取...")
+        await token_manager.invalidate(token)
+        token = await get_token()
+        if token:
+            data = await _post(endpoint, payload, token)
+    return data
+
+async def fetch_file_page(path="/", page=1, per_page=100):
+    """
+    获取一页文件列表 (服务端分页)
+    Returns:
+        (content, total, err) - total 为 Alist 返回的目录总项数
+    """
     payload = {
         "path": path,
         "page": page,
@@ -73,40 +235,44 @@ def fetch_file_list(path="/", page=1, per_page=100):
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=15)
-        data = r.json()
-        
+        data = await _authed_post("/api/fs/list", payload)
+        if data is None:
+            return None, 0, "❌ 认证失败: 无法获取 Token"
+
         if data.get("code") == 200:
             # ⚡️ 核心修复: data["data"]["content"] 可能为 None (空文件夹时)
             # 必须返回空列表 [] 而不是 None，否则 sort() 会崩溃
             content = data["data"].get("content")
-            return content if content is not None else [], None
-            
-        # Token 失效重试
-        if data.get("code") in [401, 403] and not ALIST_TOKEN:
-            logger.info("Token 可能失效，尝试重新获取...")
-            _cached_token = None
-            token = get_token()
-            if token:
-                headers["Authorization"] = token
-                r = requests.post(url, headers=headers, json=payload, timeout=15)
-                data = r.json()
-                if data.get("code") == 200:
-                    content = data["data"].get("content")
-                    return content if content is not None else [], None
-
-        return None, f"API 错误: {data.get('message')}"
+            if content is None: content = []
+            total = data["data"].get("total") or len(content)
+            return content, total, None
+
+        return None, 0, f"API 错误: {data.get('message')}"
     except Exception as e:
-        return None, f"网络请求异常: {str(e)}"
+        return None, 0, f"网络请求异常: {str(e)}"
+
+async def fetch_file_list(path="/", page=1, per_page=100):
+    """获取文件列表 (兼容旧接口，只返回 content)"""
+    content, _, err = await fetch_file_page(path, page, per_page)
+    return content, err
 
-def get_file_info(path):
+async def fetch_all_files(path, per_page=200):
+    """
+    分页拉取整个目录 (遍历 / 索引用)
+    Returns:
+        (content, err)
+    """
+    items, page = [], 1
+    while True:
+        content, total, err = await fetch_file_page(path, page, per_page)
+        if err: return None, err
+        items.extend(content)
+        if not content or len(items) >= total: return items, None
+        page += 1
+
+async def get_file_info(path):
     """获取单个文件信息"""
-    token = get_token()
-    if not token: return None
-    url = f"{ALIST_API_URL}/api/fs/get"
-    headers = {"Authorization": token}
     try:
-        r = requests.post(url, headers=headers, json={"path": path}, timeout=10)
-        return r.json()
-    except:
+        return await _authed_post("/api/fs/get", {"path": path})
+    except Exception:
         return None
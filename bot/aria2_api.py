@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import httpx
+from .config import ARIA2_RPC_SECRET
+
+logger = logging.getLogger(__name__)
+
+ARIA2_RPC_URL = "http://127.0.0.1:6800/jsonrpc"
+
+# 状态视图需要的字段，减少 RPC 返回体积
+TASK_KEYS = ["gid", "status", "totalLength", "completedLength", "downloadSpeed", "errorMessage", "files"]
+
+# 等待 / 已停止任务最多展示数量
+LIST_LIMIT = 10
+
+RPC_TIMEOUT = 5
+MAX_RETRIES = 1
+RETRY_BACKOFF = 0.3
+
+# 只读方法: 读超时后可以安全重发。addUri 等写操作只在连接未建立时重试，
+# 否则 aria2 可能已经执行过，重发会产生重复任务
+READ_ONLY_METHODS = {
+    "aria2.tellStatus", "aria2.tellActive", "aria2.tellWaiting", "aria2.tellStopped",
+    "aria2.getGlobalStat", "aria2.getGlobalOption", "aria2.getVersion",
+}
+
+class Aria2Error(Exception):
+    """Aria2 返回的 JSON-RPC 错误"""
+    pass
+
+_client = None
+_req_id = 0
+
+def _get_client():
+    """懒加载共享的 httpx.AsyncClient (保持与 aria2 的长连接)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2, keepalive_expiry=60),
+            timeout=RPC_TIMEOUT,
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+def _with_token(params):
+    if ARIA2_RPC_SECRET:
+        return [f"token:{ARIA2_RPC_SECRET}"] + list(params)
+    return list(params)
+
+async def _rpc(method, params, read_only=False, timeout=RPC_TIMEOUT):
+    global _req_id
+    _req_id += 1
+    payload = {"jsonrpc": "2.0", "id": f"bot-{_req_id}", "method": method, "params": params}
+    last_exc = None
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            r = await _get_client().post(ARIA2_RPC_URL, json=payload, timeout=timeout)
+            res = r.json()
+            if "error" in res:
+                raise Aria2Error(res["error"].get("message", str(res["error"])))
+            return res.get("result")
+        except httpx.TransportError as e:
+            last_exc = e
+            # 请求已发出 (如 ReadTimeout) 时，写操作不能重发
+            not_sent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            if attempt < MAX_RETRIES and (read_only or not_sent):
+                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+                continue
+            break
+    raise last_exc
+
+async def call(method, *params):
+    """调用单个 aria2 方法 (自动附加 RPC 密钥)"""
+    return await _rpc(method, _with_token(params), read_only=method in READ_ONLY_METHODS)
+
+async def multicall(calls, timeout=RPC_TIMEOUT):
+    """
+    使用 system.multicall 在一次往返中执行多个方法
+    Args:
+        calls: [(method, [params...]), ...]
+        timeout: 本次请求的超时 (秒)，大批量写入时需要放宽
+    Returns:
+        与 calls 等长的列表，每项为结果值或 Aria2Error 实例
+    """
+    batch = [{"methodName": m, "params": _with_token(p)} for m, p in calls]
+    read_only = all(m in READ_ONLY_METHODS for m, _ in calls)
+    raw = await _rpc("system.multicall", [batch], read_only=read_only, timeout=timeout)
+    results = []
+    for item in raw or []:
+        # 成功时为 [value]，失败时为 {"code": .., "message": ..}
+        if isinstance(item, list):
+            results.append(item[0] if item else None)
+        else:
+            results.append(Aria2Error(item.get("message", str(item))))
+    return results
+
+async def get_overview():
+    """
+    一次往返获取全局统计 + 活动 / 等待 / 已停止任务
+    Returns:
+        {"global": {...}, "active": [...], "waiting": [...], "stopped": [...]}
+    """
+    stat, active, waiting, stopped = await multicall([
+        ("aria2.getGlobalStat", []),
+        ("aria2.tellActive", [TASK_KEYS]),
+        ("aria2.tellWaiting", [0, LIST_LIMIT, TASK_KEYS]),
+        ("aria2.tellStopped", [-1, LIST_LIMIT, TASK_KEYS]),
+    ])
+    overview = {}
+    for name, value, empty in (("global", stat, {}), ("active", active, []), ("waiting", waiting, []), ("stopped", stopped, [])):
+        if isinstance(value, Aria2Error):
+            logger.warning(f"aria2 {name} 查询失败: {value}")
+            value = empty
+        overview[name] = value if value is not None else empty
+    return overview
+
+async def add_uri(url, options=None):
+    """添加单个下载任务，返回 GID"""
+    params = [[url]]
+    if options: params.append(options)
+    return await call("aria2.addUri", *params)
+
+async def add_uris(items, timeout=RPC_TIMEOUT):
+    """
+    批量添加下载任务 (单次 system.multicall)
+    Args:
+        items: [(url, options_or_None), ...]
+        timeout: 请求超时 (秒)
+    Returns:
+        与 items 等长的列表，每项为 GID 或 Aria2Error 实例
+    """
+    calls = []
+    for url, options in items:
+        params = [[url]]
+        if options: params.append(options)
+        calls.append(("aria2.addUri", params))
+    return await multicall(calls, timeout=timeout)
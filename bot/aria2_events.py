@@ -0,0 +1,79 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import websockets
+from telegram.constants import ParseMode
+from . import aria2_api
+from .system import format_bytes, escape_text
+
+logger = logging.getLogger(__name__)
+
+ARIA2_WS_URL = "ws://127.0.0.1:6800/jsonrpc"
+
+# 重连退避 (秒)
+RECONNECT_MIN = 1
+RECONNECT_MAX = 60
+
+# 关注的通知及对应提示
+EVENT_LABELS = {
+    "aria2.onDownloadComplete": "✅ 下载完成",
+    "aria2.onBtDownloadComplete": "✅ BT 下载完成",
+    "aria2.onDownloadError": "❌ 下载失败",
+}
+
+async def _describe(gid):
+    """查询任务名称与错误信息 (经由 aria2_api 的连接池)"""
+    try:
+        status = await aria2_api.call("aria2.tellStatus", gid, ["files", "errorMessage", "totalLength"])
+        files = status.get("files") or [{}]
+        path = files[0].get("path") or ""
+        name = os.path.basename(path) if path else gid
+        return name, status.get("errorMessage"), int(status.get("totalLength", 0))
+    except Exception as e:
+        logger.debug(f"查询任务 {gid} 详情失败: {e}")
+        return gid, None, 0
+
+async def _handle_event(bot, chat_id, method, params):
+    label = EVENT_LABELS.get(method)
+    if not label: return
+    for ev in params or []:
+        gid = ev.get("gid")
+        if not gid: continue
+        name, err, total = await _describe(gid)
+        msg = f"{label}\n📄 `{escape_text(name)}`"
+        if total: msg += f"\n📏 {format_bytes(total)}"
+        if err and method == "aria2.onDownloadError":
+            msg += f"\n🔻 {escape_text(err)}"
+        try:
+            await bot.send_message(chat_id=chat_id, text=msg, parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            logger.warning(f"推送 aria2 通知失败: {e}")
+
+async def run_subscriber(bot, chat_id):
+    """
+    长连接订阅 aria2 WebSocket 通知，断线后指数退避重连
+    仅处理下载完成 / 出错事件并推送给管理员
+    """
+    delay = RECONNECT_MIN
+    while True:
+        try:
+            async with websockets.connect(ARIA2_WS_URL, ping_interval=30, ping_timeout=10) as ws:
+                logger.info("📡 已订阅 aria2 事件推送")
+                delay = RECONNECT_MIN
+                async for raw in ws:
+                    try:
+                        data = json.loads(raw)
+                    except ValueError:
+                        continue
+                    # 通知没有 id 字段
+                    method = data.get("method")
+                    if method and "id" not in data:
+                        await _handle_event(bot, chat_id, method, data.get("params"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"aria2 WebSocket 断开: {e}，{delay}s 后重连")
+        await asyncio.sleep(delay + random.uniform(0, delay / 2))
+        delay = min(delay * 2, RECONNECT_MAX)
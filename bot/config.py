@@ -1,6 +1,5 @@
 
 import os
-import itertools
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -35,18 +34,15 @@ if _multi_accounts_str:
     except Exception as e:
         print(f"⚠️ 解析 GITHUB_ACCOUNTS_LIST 失败: {e}")
 
+# GitHub API 地址，可指向本地模拟服务用于测试
+GITHUB_API_URL = (os.getenv("GITHUB_API_URL") or "https://api.github.com").rstrip("/")
+
 _account_count = len(GITHUB_POOL)
 if _account_count > 0:
     print(f"✅ 已加载 {_account_count} 个 GitHub 推流账号")
 else:
     print("⚠️ 未配置 GitHub 推流账号")
 
-_account_cycle = itertools.cycle(GITHUB_POOL) if GITHUB_POOL else None
-
-def get_next_github_account():
-    if not _account_cycle: return None
-    return next(_account_cycle)
-
 def get_account_count():
     return len(GITHUB_POOL)
 
@@ -56,6 +52,12 @@ ALIST_PASSWORD = os.getenv("ALIST_PASSWORD")
 ALIST_TOKEN = os.getenv("ALIST_TOKEN")
 HOME_DIR = HOME
 
+# 文件索引每轮最多调用的 fs/list 次数
+INDEX_CRAWL_BUDGET = int(os.getenv("INDEX_CRAWL_BUDGET") or 200)
+
+# 服务宕机时是否自动 pm2 restart (默认只告警)
+WATCHDOG_AUTO_RESTART = os.getenv("WATCHDOG_AUTO_RESTART", "").lower() in ("1", "true", "yes")
+
 # ⚡️ 菜单
 MAIN_MENU = [
     ["📂 文件", "📊 状态", "📥 任务"], 
@@ -87,3 +89,9 @@ def check_auth(user_id):
         return str(user_id) == clean_admin
     except:
         return False
+
+def get_admin_chat_id():
+    """返回去除注释后的管理员 ID，未配置时为 None (用于主动推送)"""
+    if not ADMIN_ID: return None
+    clean_admin = str(ADMIN_ID).split('#')[0].strip()
+    return clean_admin or None
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from .alist_api import fetch_file_page
+
+logger = logging.getLogger(__name__)
+
+# --- 目录列表缓存 ---
+# 以 Alist 路径为键的 LRU 缓存:
+#   - 未过期: 直接返回
+#   - 过期但在 MAX_STALE 内: 先返回旧数据，后台刷新 (stale-while-revalidate)
+#   - 超过 MAX_STALE: 同步重新拉取
+
+CACHE_TTL = 30          # 秒，条目新鲜期
+CACHE_MAX_STALE = 600   # 秒，允许返回旧数据的最长时间
+CACHE_MAX_ENTRIES = 128 # 最多缓存的目录数量
+
+# --- 分页模式 ---
+# 目录总数 <= LOCAL_SORT_LIMIT: 一次拉取，本地排序后在内存中分页 (目录优先)
+# 目录总数 >  LOCAL_SORT_LIMIT: 使用 Alist 服务端分页，只拉取当前显示的窗口，
+#                              保持 Alist 返回的顺序 (逐页排序会把目录拉到每页顶部，跨页顺序错乱)
+LOCAL_SORT_LIMIT = 200
+
+def sort_items(items):
+    """目录在前，按名称排序"""
+    return sorted(items, key=lambda x: (not x.get('is_dir', False), x.get('name', '')))
+
+class DirCache:
+    def __init__(self, ttl=CACHE_TTL, max_stale=CACHE_MAX_STALE, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (fetched_at, items, total)
+        self._totals = OrderedDict()   # path -> 最近一次看到的目录总项数 (分页索引)
+        self._refreshing = {}          # key -> asyncio.Task
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def _load(self, key):
+        path, page, per_page = key
+        files, total, err = await fetch_file_page(path, page, per_page)
+        if err:
+            return None, 0, err
+        items = files or []
+        # 只有整个目录都在这一页时才本地排序
+        if page == 1 and total <= len(items): items = sort_items(items)
+        self._put(key, items, total)
+        return items, total, None
+
+    def _put(self, key, items, total):
+        self._entries[key] = (time.monotonic(), items, total)
+        self._entries.move_to_end(key)
+        self.remember_total(key[0], total)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _background_refresh(self, key):
+        try:
+            _, _, err = await self._load(key)
+            if err: logger.warning(f"后台刷新目录失败 {key[0]}: {err}")
+        except Exception as e:
+            logger.warning(f"后台刷新目录异常 {key[0]}: {e}")
+        finally:
+            if self._refreshing.get(key) is asyncio.current_task():
+                self._refreshing.pop(key, None)
+
+    def _schedule_refresh(self, key):
+        if key in self._refreshing: return
+        self._refreshing[key] = asyncio.create_task(self._background_refresh(key))
+
+    async def get(self, path, page=1, per_page=200, record_stats=True):
+        """
+        获取一页目录列表 (整目录一页时已排序，服务端分页时为 Alist 原始顺序)
+        record_stats=False 用于预取，不计入命中统计
+        Returns:
+            (items, total, err)
+        """
+        key = (path, page, per_page)
+        entry = self._entries.get(key)
+        if entry:
+            fetched_at, items, total = entry
+            age = time.monotonic() - fetched_at
+            if age <= self.ttl:
+                if record_stats: self.hits += 1
+                self._entries.move_to_end(key)
+                return items, total, None
+            if age <= self.max_stale:
+                if record_stats: self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._schedule_refresh(key)
+                return items, total, None
+
+        if record_stats: self.misses += 1
+        return await self._load(key)
+
+    def peek(self, path, page=1, per_page=200):
+        """只读查询，不计入统计，不触发拉取"""
+        entry = self._entries.get((path, page, per_page))
+        return entry[1] if entry else None
+
+    def remember_total(self, path, total):
+        self._totals[path] = total
+        self._totals.move_to_end(path)
+        while len(self._totals) > self.max_entries:
+            self._totals.popitem(last=False)
+
+    def known_total(self, path):
+        """返回该目录已知的总项数，未知则为 None"""
+        return self._totals.get(path)
+
+    def invalidate(self, path):
+        """删除某路径的所有分页缓存"""
+        for key in [k for k in self._entries if k[0] == path]:
+            del self._entries[key]
+        # 取消进行中的后台刷新，否则它会把改名 / 删除前的旧列表写回缓存
+        for key in [k for k in self._refreshing if k[0] == path]:
+            self._refreshing.pop(key).cancel()
+        self._totals.pop(path, None)
+
+    def clear(self):
+        for task in self._refreshing.values(): task.cancel()
+        self._refreshing.clear()
+        self._entries.clear()
+        self._totals.clear()
+
+    def stats(self):
+        total = self.hits + self.stale_hits + self.misses
+        hit_rate = round((self.hits + self.stale_hits) / total * 100, 1) if total else 0
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": hit_rate,
+        }
+
+dir_cache = DirCache()
+
+def is_large_dir(path):
+    """是否已知为超大目录 (走服务端分页)"""
+    total = dir_cache.known_total(path)
+    return total is not None and total > LOCAL_SORT_LIMIT
+
+async def get_page(path, page, page_size, record_stats=True):
+    """
+    获取浏览器某一页 (page 从 0 开始)
+    小目录整体拉取后本地切片；超大目录只向 Alist 请求当前窗口，
+    内存与耗时只与 page_size 相关，与目录总数无关。
+    Returns:
+        (items, total, page, err) - page 为修正越界后的页码
+    """
+    if not is_large_dir(path):
+        files, total, err = await dir_cache.get(path, 1, LOCAL_SORT_LIMIT, record_stats)
+        if err: return None, 0, page, err
+        if total <= LOCAL_SORT_LIMIT:
+            total_pages = max(1, math.ceil(len(files) / page_size))
+            page = min(max(page, 0), total_pages - 1)
+            start = page * page_size
+            return files[start:start + page_size], len(files), page, None
+        # 首次发现是超大目录，丢弃整块缓存，切换到服务端分页
+        dir_cache.invalidate(path)
+        dir_cache.remember_total(path, total)
+
+    page = max(page, 0)
+    items, total, err = await dir_cache.get(path, page + 1, page_size, record_stats)
+    if err: return None, 0, page, err
+    total_pages = max(1, math.ceil(total / page_size))
+    if page >= total_pages:
+        page = total_pages - 1
+        items, total, err = await dir_cache.get(path, page + 1, page_size, record_stats)
+        if err: return None, 0, page, err
+    return items, total, page, None
+
+def get_cache_stats_text():
+    """用于状态面板的缓存统计"""
+    s = dir_cache.stats()
+    return f"🗂 目录缓存: `{s['entries']}` 项 | 命中 `{s['hits']}`+`{s['stale_hits']}` | 未命中 `{s['misses']}` ({s['hit_rate']}%)"
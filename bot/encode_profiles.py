@@ -0,0 +1,78 @@
+# --- 自适应编码档位 ---
+# 根据探测到的分辨率 / 帧率 / 编码选择 Runner 端的转码参数，
+# 以 client_payload.profile 传给 Workflow。GitHub Runner 只有 2 核，
+# 高分辨率或 HEVC 源优先保证 >=1x 速度，低分辨率源不浪费码率。
+
+HEAVY_DECODE_CODECS = ("hevc", "vp9", "av1")
+
+# 档位模板: preset / 最大宽度 / CRF / 最大码率 (k) / 音频码率 (k) / 帧率上限 (0 为不限)
+PROFILES = {
+    "sd":      {"preset": "veryfast",  "max_width": 854,  "crf": 24, "maxrate": 1500, "audio_bitrate": 96,  "fps_cap": 0},
+    "hd":      {"preset": "superfast", "max_width": 1280, "crf": 25, "maxrate": 3000, "audio_bitrate": 128, "fps_cap": 0},
+    "fhd":     {"preset": "ultrafast", "max_width": 1280, "crf": 26, "maxrate": 4500, "audio_bitrate": 128, "fps_cap": 30},
+    "uhd":     {"preset": "ultrafast", "max_width": 960,  "crf": 27, "maxrate": 3500, "audio_bitrate": 128, "fps_cap": 30},
+    # 未能探测时沿用 Workflow 原有的固定参数
+    "default": {"preset": "ultrafast", "max_width": 1280, "crf": 26, "maxrate": 4500, "audio_bitrate": 128, "fps_cap": 0},
+}
+
+KEYFRAME_SECONDS = 2  # 关键帧间隔 (秒)，Telegram 直播推荐 2s
+
+def _pick_name(info):
+    if not info or not info.get("height"):
+        return "default"
+    height = info["height"]
+    if height > 1080 or (info.get("vcodec") in HEAVY_DECODE_CODECS and height > 720):
+        return "uhd"
+    if height > 720:
+        return "fhd"
+    if height > 480:
+        return "hd"
+    return "sd"
+
+def choose_profile(info):
+    """
+    选择编码档位
+    Returns:
+        档位字典 (包含 name / preset / max_width / crf / maxrate / bufsize / gop / audio_bitrate / fps_cap)
+    """
+    name = _pick_name(info)
+    profile = dict(PROFILES[name], name=name)
+
+    # 低分辨率源保持原始宽度，不做放大
+    if info and info.get("width"):
+        profile["max_width"] = min(profile["max_width"], info["width"])
+
+    fps = (info or {}).get("fps") or 30
+    if profile["fps_cap"] and fps > profile["fps_cap"]:
+        fps = profile["fps_cap"]
+    else:
+        profile["fps_cap"] = 0
+    profile["gop"] = max(1, int(round(fps * KEYFRAME_SECONDS)))
+    profile["bufsize"] = profile["maxrate"] * 2
+
+    # GitHub 表达式中统一用字符串，避免 0 被当作假值
+    return {k: str(v) for k, v in profile.items()}
+
+def copy_profile():
+    """直通模式的档位记录"""
+    return {"name": "copy"}
+
+def describe_profile(profile):
+    if not profile: return ""
+    if profile.get("name") == "copy": return "copy (不转码)"
+    text = f"{profile['name']} {profile['preset']} ≤{profile['max_width']}w {profile['maxrate']}k GOP{profile['gop']}"
+    if profile.get("fps_cap") not in (None, "0"): text += f" {profile['fps_cap']}fps"
+    return text
+
+# 解码开销由低到高，队列按最重的条目选档
+PROFILE_WEIGHT = ("sd", "hd", "default", "fhd", "uhd")
+
+def choose_queue_profile(infos):
+    """
+    队列模式的档位: 按最重的条目选择 preset / 码率，
+    输出固定为 Workflow 的 1280x720 / 30fps (各条目需拼接到同一路推流)
+    """
+    heaviest = max(infos or [None], key=lambda info: PROFILE_WEIGHT.index(_pick_name(info)))
+    profile = choose_profile(heaviest)
+    profile.update(max_width="1280", fps_cap="30", gop=str(30 * KEYFRAME_SECONDS))
+    return profile
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- 阻塞任务执行器 ---
+# 无法改为异步 I/O 的阻塞调用 (psutil / 子进程 / 本地 socket) 统一放到这个
+# 有界线程池执行，避免占用默认执行器或直接卡住事件循环。
+
+MAX_WORKERS = 4     # 线程数
+MAX_PENDING = 32    # 最多排队 + 运行中的任务数，超出时直接拒绝
+
+class ExecutorBusy(Exception):
+    """排队任务过多"""
+    pass
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bot-blocking")
+_lock = threading.Lock()
+_stats = {"pending": 0, "running": 0, "completed": 0, "rejected": 0, "max_pending": 0}
+
+def _wrap(fn, args, kwargs):
+    with _lock:
+        _stats["pending"] -= 1
+        _stats["running"] += 1
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        with _lock:
+            _stats["running"] -= 1
+            _stats["completed"] += 1
+
+def _on_done(fut):
+    # 尚未开始就被取消的任务不会经过 _wrap，需要在这里扣减排队数
+    if fut.cancelled():
+        with _lock:
+            _stats["pending"] -= 1
+
+async def run_blocking(fn, *args, **kwargs):
+    """在专用线程池中执行阻塞函数"""
+    with _lock:
+        if _stats["pending"] + _stats["running"] >= MAX_PENDING:
+            _stats["rejected"] += 1
+            raise ExecutorBusy("系统繁忙，请稍后再试")
+        _stats["pending"] += 1
+        _stats["max_pending"] = max(_stats["max_pending"], _stats["pending"])
+    fut = _executor.submit(_wrap, fn, args, kwargs)
+    fut.add_done_callback(_on_done)
+    return await asyncio.wrap_future(fut)
+
+def executor_stats():
+    with _lock:
+        return dict(_stats)
+
+def get_executor_stats_text():
+    """用于状态面板的执行器指标"""
+    s = executor_stats()
+    return f"🧵 执行器: 排队 `{s['pending']}` | 运行 `{s['running']}`/{MAX_WORKERS} | 峰值排队 `{s['max_pending']}` | 拒绝 `{s['rejected']}`"
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
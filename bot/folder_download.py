@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+import posixpath
+import time
+from urllib.parse import quote
+import httpx
+from .alist_api import fetch_all_files
+from . import aria2_api
+
+logger = logging.getLogger(__name__)
+
+# --- 目录递归下载 ---
+# 并发遍历 Alist 子目录，收集所有文件的 /d/ 链接，
+# 最后分批通过 system.multicall 提交给 aria2，并保持原有目录结构。
+
+LIST_CONCURRENCY = 4   # 同时进行的 fs/list 请求数
+MAX_FILES = 2000       # 单次最多提交的文件数，防止误操作拖垮 aria2
+PROGRESS_INTERVAL = 2  # 秒，进度回调的最小间隔
+SUBMIT_CHUNK = 200     # 每次 multicall 提交的任务数
+SUBMIT_TIMEOUT = 30    # 秒，单批提交的超时 (手机上 aria2 处理大批 addUri 较慢)
+
+async def walk_tree(root, on_progress=None):
+    """
+    并发遍历目录树
+    Returns:
+        (files, errors, truncated) - files 为 [(完整路径, 相对 root 的目录)]，
+        truncated 表示因达到 MAX_FILES 而有文件或子目录未收集
+    """
+    sem = asyncio.Semaphore(LIST_CONCURRENCY)
+    files, errors = [], []
+    state = {"dirs": 0, "last_report": 0, "truncated": False}
+
+    async def visit(path, rel):
+        async with sem:
+            items, err = await fetch_all_files(path)
+            if err:
+                errors.append(f"{path}: {err}")
+                return
+        state["dirs"] += 1
+        children = []
+        for item in items:
+            full = posixpath.join(path, item['name'])
+            if item.get('is_dir'):
+                children.append(visit(full, posixpath.join(rel, item['name'])))
+            elif len(files) < MAX_FILES:
+                files.append((full, rel))
+            else:
+                state["truncated"] = True
+        if on_progress and time.monotonic() - state["last_report"] >= PROGRESS_INTERVAL:
+            state["last_report"] = time.monotonic()
+            await on_progress(state["dirs"], len(files))
+        if children and len(files) < MAX_FILES:
+            await asyncio.gather(*children)
+        elif children:
+            state["truncated"] = True
+            for c in children: c.close()
+
+    await visit(root, "")
+    return files, errors, state["truncated"]
+
+async def download_folder(root, base_url, on_progress=None):
+    """
+    递归下载目录
+    Returns:
+        (success, msg)
+    """
+    files, errors, truncated = await walk_tree(root, on_progress)
+    if not files:
+        return False, "📂 目录中没有可下载的文件" + (f" ({len(errors)} 个目录读取失败)" if errors else "")
+
+    # aria2 的下载根目录，在其下按 Alist 目录结构建子目录
+    try:
+        options = await aria2_api.call("aria2.getGlobalOption")
+        base_dir = options.get("dir") or ""
+    except Exception as e:
+        return False, f"❌ 无法连接 Aria2: {e}"
+
+    folder_name = posixpath.basename(root.rstrip("/")) or "alist"
+    batch = []
+    for full, rel in files:
+        url = f"{base_url}/d{quote(full)}"
+        opts = {"dir": os.path.join(base_dir, folder_name, rel)} if base_dir else None
+        batch.append((url, opts))
+
+    # 大批量 multicall 是最慢的一步，提交前再报告一次
+    if on_progress: await on_progress(None, len(batch))
+    results, unknown = [], 0
+    for i in range(0, len(batch), SUBMIT_CHUNK):
+        try:
+            results.extend(await aria2_api.add_uris(batch[i:i + SUBMIT_CHUNK], timeout=SUBMIT_TIMEOUT))
+        except httpx.TransportError as e:
+            # 请求可能已被 aria2 执行 (如读超时)，不重发，剩余批次也不再提交
+            logger.warning(f"提交到 Aria2 失败: {e!r}")
+            unknown = len(batch) - i
+            break
+    failed = [r for r in results if isinstance(r, aria2_api.Aria2Error)]
+    msg = f"✅ 已提交 `{len(results) - len(failed)}` 个文件到 Aria2"
+    if failed: msg += f"\n⚠️ 提交失败 `{len(failed)}` 个: {failed[0]}"
+    if unknown: msg += f"\n⚠️ 其余 `{unknown}` 个提交时 Aria2 无响应，结果未知，请在任务列表确认"
+    if errors: msg += f"\n⚠️ 读取失败目录 `{len(errors)}` 个"
+    if truncated: msg += f"\n⚠️ 文件数超过上限，仅提交前 {MAX_FILES} 个"
+    return True, msg
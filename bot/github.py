@@ -1,39 +1,59 @@
 
-import requests
-import urllib.parse
-import re
-from .config import get_next_github_account, get_account_count, GITHUB_POOL
-from .alist_api import get_token, get_file_info
-
-def escape_text(text):
-    """转义 Markdown V1 特殊字符"""
-    if not text: return ""
-    return str(text).replace("_", "\\_").replace("*", "\\*").replace("`", "\\`").replace("[", "\\[")
-
-def trigger_stream_action(base_url, raw_path, target_rtmp_url, extra_payload=None):
+import asyncio
+import uuid
+import posixpath
+from .config import get_account_count
+from .system import escape_text
+from .github_pool import scheduler
+from .stream_registry import registry
+from . import github_api
+from .alist_api import get_token
+from .url_resolver import url_resolver
+from .media_probe import probe_media, is_passthrough_compatible, describe_media
+from .encode_profiles import choose_profile, choose_queue_profile, copy_profile, describe_profile
+
+# 与账号相关的失败 (认证 / 权限 / 仓库不存在 / 限流 / 服务端错误) 才切换账号
+ACCOUNT_FAILURE_CODES = (401, 403, 404, 429)
+
+QUEUE_PROBE_CONCURRENCY = 4  # 队列条目同时进行的 ffprobe 数
+
+def _is_account_failure(status_code):
+    return status_code in ACCOUNT_FAILURE_CODES or status_code >= 500
+
+async def _probe_all(paths):
+    sem = asyncio.Semaphore(QUEUE_PROBE_CONCURRENCY)
+
+    async def one(path):
+        async with sem:
+            return await probe_media(path)
+
+    return await asyncio.gather(*(one(p) for p in paths))
+
+async def trigger_stream_action(base_url, raw_path, target_rtmp_url, extra_payload=None, queue_paths=None):
     """
     触发 GitHub Actions 进行推流
     Args:
         base_url: Alist 的公网地址 (Tunnel URL)
         raw_path: 视频文件路径 (标准模式用)
         target_rtmp_url: 目标 RTMP 推流地址
-        extra_payload: 字典，Radio 模式下的额外参数
+        extra_payload: 字典，Radio / 队列模式下的额外参数
+        queue_paths: 队列模式下已解析的文件路径 (用于提示与推流记录)
     """
     if not target_rtmp_url:
         return False, "❌ 错误: 未提供 RTMP 推流地址", ""
 
-    # 获取当前轮到的账号
-    account = get_next_github_account()
+    # 选择负载最低的健康账号
+    account = scheduler.pick()
     if not account:
         return False, "❌ 未配置 GitHub 账号！请在 `~/.env` 设置 GITHUB_ACCOUNTS_LIST", ""
 
-    repo = account['repo']
-    token = account['token']
     pool_size = get_account_count()
 
     # 获取 Alist Token
-    alist_token = get_token() or ""
+    alist_token = await get_token() or ""
     video_url = ""
+    profile = None
+    record_extra = {}
     
     # 构造 Payload
     client_payload = {
@@ -50,74 +70,100 @@ def trigger_stream_action(base_url, raw_path, target_rtmp_url, extra_payload=Non
         display_msg = "📻 *Radio 推流任务*\n"
         display_msg += f"🎵 音频源: `{escape_text(extra_payload.get('audio_path'))}`\n"
         display_msg += f"🖼 背景源: `{escape_text(extra_payload.get('image_path'))}`"
-        
+        stream_label = f"📻 {extra_payload.get('audio_path')}"
+
+    elif extra_payload and extra_payload.get("mode") == "queue":
+        # 队列模式: 一个 Runner 连续播放多个文件
+        client_payload.update(extra_payload)
+        client_payload["video_url"] = "queue_placeholder"
+
+        # 队列条目的编码可能各不相同，Runner 逐个转码后接续推流；按最重的条目选择档位
+        profile = choose_queue_profile(await _probe_all(queue_paths))
+        client_payload["profile"] = profile
+
+        names = [posixpath.basename(p) for p in queue_paths]
+        display_msg = f"🎬 *队列推流任务* ({len(names)} 个)\n"
+        display_msg += "\n".join(f"{i}. `{escape_text(n)}`" for i, n in enumerate(names[:10], 1))
+        if len(names) > 10: display_msg += f"\n… 等 {len(names)} 个"
+        display_msg += f"\n🎚 档位: `{escape_text(describe_profile(profile))}`"
+        stream_label = f"🎬 队列 {len(names)} 个: {names[0]}"
+        record_extra["queue"] = names
+
     else:
         # 标准视频模式
-        try:
-            # 1. 尝试通过 API 获取真实直链
-            file_data = get_file_info(raw_path)
-            if file_data and file_data.get("code") == 200:
-                raw_url = file_data["data"].get("raw_url", "")
-                if raw_url:
-                    if raw_url.startswith("http"):
-                        # 🚨 关键检查: 如果 Alist 返回的是本地 IP (127.0.0.1/192.168/localhost)
-                        # 说明 Alist 没配置 Site URL。GitHub 无法访问本地 IP。
-                        # 此时必须强制回退到使用 base_url (Tunnel) 的手动构造模式。
-                        is_local = re.search(r'://(127\.|10\.|172\.(1[6-9]|2\d|3[0-1])\.|192\.168\.|localhost)', raw_url)
-                        if not is_local:
-                             video_url = raw_url
-                        else:
-                             print(f"⚠️ 检测到本地链接 {raw_url}，将使用 Tunnel 回退方案")
-                    else:
-                        # 相对路径，加上 Base URL (Tunnel)
-                        video_url = f"{base_url}{raw_url}"
-                        if alist_token:
-                            sep = "&" if "?" in video_url else "?"
-                            video_url += f"{sep}token={alist_token}"
-        except Exception as e:
-            print(f"获取文件信息失败: {e}")
-
-        # 2. 回退方案: 手动构造 /d 下载链接 (最稳妥，走 Tunnel)
-        if not video_url:
-            if not raw_path.startswith("/"): raw_path = "/" + raw_path
-            # 使用 quote 编码路径，确保空格和中文正常
-            encoded_path = urllib.parse.quote(raw_path)
-            # 修正: Alist 的 /d 链接通常是 /d/path/to/file
-            # 注意: encoded_path 已经包含了开头的 /
-            video_url = f"{base_url}/d{encoded_path}"
-            if alist_token:
-                video_url += f"?token={alist_token}"
+        # 1. 解析 Runner 可访问的地址: 公网直链优先，本地 IP / 相对路径回退到隧道 /d 链接 (按路径缓存)
+        video_url, route = await url_resolver.resolve(raw_path, base_url)
+        record_extra["route"] = route
         
         client_payload["video_url"] = video_url
         client_payload["mode"] = "standard"
+
+        # 2. 本机 ffprobe 探测源编码，兼容时让 Runner 直接 -c copy，不再转码
+        media_info = await probe_media(raw_path)
+        passthrough = is_passthrough_compatible(media_info)
+        client_payload["passthrough"] = "true" if passthrough else "false"
+
+        # 3. 需要转码时按源分辨率 / 帧率 / 编码选择档位 (GitHub 限制 client_payload 顶层 10 个键，档位嵌套传递)
+        profile = copy_profile() if passthrough else choose_profile(media_info)
+        client_payload["profile"] = profile
         
         display_msg = f"📺 *视频推流任务*\n📄 文件: `{escape_text(raw_path)}`"
+        display_msg += "\n🔗 线路: " + ("网盘直链" if route == "direct" else "隧道中转")
+        if media_info:
+            display_msg += f"\n🎞 源: `{escape_text(describe_media(media_info))}`"
+        if passthrough:
+            display_msg += "\n⚡️ 直通模式 (不转码)"
+        else:
+            display_msg += f"\n🎚 档位: `{escape_text(describe_profile(profile))}`"
+        stream_label = raw_path
 
-    # GitHub API 请求
-    api_url = f"https://api.github.com/repos/{repo}/dispatches"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
     data = {
         "event_type": "start_stream",
         "client_payload": client_payload
     }
 
-    try:
-        r = requests.post(api_url, headers=headers, json=data, timeout=10)
+    # GitHub API 请求: 单账号内重试，失败后自动切换到下一个账号
+    tried = []
+    errors = []
+    while account:
+        repo = account['repo']
+        tried.append(repo)
         safe_repo = escape_text(repo)
+        dispatch_id = f"dispatch-{uuid.uuid4().hex[:12]}"
 
-        if r.status_code == 204:
-            msg = f"✅ *指令已发送* (账号池: {pool_size})\n"
-            msg += f"👤 仓库: `{safe_repo}`\n\n"
-            msg += display_msg
-            return True, msg, video_url
-        elif r.status_code == 404:
-            return False, f"❌ 找不到仓库 `{safe_repo}` (404)\n可能原因: 仓库名填错 / Token 权限不足 / 仓库是私有的", video_url
-        elif r.status_code == 401:
-            return False, f"❌ Token 无效 (401)\n请检查 GITHUB_ACCOUNTS_LIST 配置", video_url
+        try:
+            r = await github_api.request_with_retry("POST", f"/repos/{repo}/dispatches", account['token'], json=data)
+        except Exception as e:
+            scheduler.record_result(account, None)
+            errors.append(f"`{safe_repo}`: 网络请求失败 {escape_text(str(e))}")
         else:
-            return False, f"❌ GitHub 拒绝: {r.status_code}\n{escape_text(r.text)}", video_url
-    except Exception as e:
-        return False, f"❌ 网络请求失败: {escape_text(str(e))}", video_url
+            if not _is_account_failure(r.status_code) and r.status_code != 204:
+                # 请求本身有误 (如 422 client_payload 不合法)，换账号也一样失败，
+                # 直接返回且不影响账号健康度
+                scheduler.update_rate_limit(account, r.headers)
+                msg = f"❌ GitHub 拒绝了推流请求 ({r.status_code}): {escape_text(r.text[:200])}"
+                return False, msg, video_url
+            scheduler.record_result(account, r.status_code, r.headers, run_id=dispatch_id)
+            if r.status_code == 204:
+                if profile: record_extra["profile"] = profile
+                stream_id = registry.register(repo, dispatch_id, stream_label, extra=record_extra)
+                msg = f"✅ *指令已发送* (账号池: {pool_size})\n"
+                msg += f"👤 仓库: `{safe_repo}`\n"
+                msg += f"🆔 推流编号: `{stream_id}` (/streams 查看, /stopstream {stream_id} 停止)\n"
+                if errors:
+                    msg += f"🔁 已跳过失败账号 {len(errors)} 个\n"
+                msg += "\n" + display_msg
+                return True, msg, video_url
+            elif r.status_code == 404:
+                errors.append(f"`{safe_repo}`: 找不到仓库 (404)，仓库名填错 / Token 权限不足 / 仓库是私有的")
+            elif r.status_code == 401:
+                errors.append(f"`{safe_repo}`: Token 无效 (401)")
+            else:
+                errors.append(f"`{safe_repo}`: GitHub 拒绝 {r.status_code} {escape_text(r.text[:200])}")
+
+        # 切换到下一个未尝试的账号
+        account = scheduler.pick(exclude=tried)
+
+    msg = f"❌ 所有账号均派发失败 (尝试 {len(tried)}/{pool_size})\n" + "\n".join(errors)
+    msg += "\n请检查 GITHUB_ACCOUNTS_LIST 配置"
+    return False, msg, video_url
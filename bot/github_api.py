@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import random
+import httpx
+from .config import GITHUB_API_URL
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 10
+
+# 5xx / 网络异常重试 (带随机抖动的指数退避)
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+# HTTP/2 需要 h2 库 (pip install httpx[http2])，缺失时退回 HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+_client = None
+
+def _get_client():
+    """懒加载共享的 GitHub API 连接池"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=GITHUB_API_URL,
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=120),
+            timeout=REQUEST_TIMEOUT,
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+def auth_headers(token, extra=None):
+    headers = {
+        "Authorization": f"token {token}",
+        "Accept": "application/vnd.github.v3+json",
+    }
+    if extra: headers.update(extra)
+    return headers
+
+async def request(method, url, token, json=None, params=None, headers=None):
+    """发送一次 GitHub API 请求，返回 httpx.Response"""
+    return await _get_client().request(method, url, json=json, params=params, headers=auth_headers(token, headers))
+
+async def request_with_retry(method, url, token, json=None, params=None, headers=None, retries=MAX_RETRIES):
+    """
+    带重试的请求: 连接异常与 5xx 时按抖动指数退避重试
+    Returns:
+        最后一次的 httpx.Response；所有尝试都是网络异常时抛出最后的异常
+    """
+    for attempt in range(retries + 1):
+        try:
+            r = await request(method, url, token, json=json, params=params, headers=headers)
+            if r.status_code < 500 or attempt == retries:
+                return r
+            logger.info(f"GitHub {r.status_code}，第 {attempt + 1} 次重试...")
+        except httpx.TransportError as e:
+            if attempt == retries: raise
+            logger.info(f"GitHub 连接异常 ({e})，第 {attempt + 1} 次重试...")
+        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
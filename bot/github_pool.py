@@ -0,0 +1,175 @@
+import asyncio
+import copy
+import logging
+import time
+from .config import GITHUB_POOL
+from .storage import data_path, atomic_write_json, read_json
+from .executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# --- GitHub 账号调度 ---
+# 记录每个账号的派发结果、限流额度与进行中的推流，
+# 选择负载最低的健康账号；失败账号按指数退避隔离。状态持久化到数据目录。
+
+STATE_FILE = data_path("github_pool.json")
+
+RUN_TIMEOUT = 360 * 60         # Workflow 最长运行时间 (秒)，超时视为已结束
+MAX_IN_FLIGHT = 1              # 单账号并发推流上限 (超出后仅在无其他选择时使用)
+RATE_LIMIT_RESERVE = 10        # 剩余额度低于该值视为不可用
+QUARANTINE_BASE = 60           # 首次隔离时长 (秒)
+QUARANTINE_MAX = 6 * 3600      # 最长隔离时长 (秒)
+AUTH_FAILURE_CODES = (401, 403, 404)
+SAVE_DELAY = 2                 # 秒，状态写盘的合并间隔 (避免每次派发都在事件循环上 fsync)
+
+class AccountScheduler:
+    def __init__(self, pool, state_file=STATE_FILE):
+        self.pool = pool
+        self.state_file = state_file
+        self.state = {}  # repo -> 状态字典 (不含 Token)
+        self._save_task = None
+        self._load()
+
+    def _entry(self, repo):
+        return self.state.setdefault(repo, {
+            "failures": 0,
+            "quarantine_until": 0,
+            "rate_remaining": None,
+            "rate_reset": 0,
+            "in_flight": [],  # [{"id": .., "started": ts}]
+            "last_status": None,
+            "dispatches": 0,
+            "last_picked": 0,
+        })
+
+    def _load(self):
+        data = read_json(self.state_file, {})
+        if isinstance(data, dict):
+            repos = {acc["repo"] for acc in self.pool}
+            self.state = {k: v for k, v in data.items() if k in repos}
+
+    def _write(self, snapshot):
+        try:
+            atomic_write_json(self.state_file, snapshot)
+        except Exception as e:
+            logger.warning(f"保存账号池状态失败: {e}")
+
+    def _save(self):
+        """合并短时间内的多次修改，在执行器线程中写盘"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self.state)  # 无事件循环 (脚本调用) 时直接写
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(SAVE_DELAY)
+        await self.flush()
+
+    async def flush(self):
+        """立即写盘 (退出时调用)"""
+        try:
+            await run_blocking(self._write, copy.deepcopy(self.state))
+        except Exception as e:
+            logger.warning(f"保存账号池状态失败: {e}")
+
+    def _prune(self, entry, now):
+        entry["in_flight"] = [r for r in entry["in_flight"] if now - r["started"] < RUN_TIMEOUT]
+
+    def _score(self, acc, now):
+        """分数越小越优先: (是否不可用, 进行中数量, -剩余额度, 上次被选中时间)"""
+        e = self._entry(acc["repo"])
+        self._prune(e, now)
+        unavailable = e["quarantine_until"] > now
+        remaining = e["rate_remaining"]
+        if remaining is not None and remaining < RATE_LIMIT_RESERVE and e["rate_reset"] > now:
+            unavailable = True
+        busy = len(e["in_flight"]) >= MAX_IN_FLIGHT
+        # 额度按 500 分档，避免微小差异压过轮换；同档时选最久未使用的账号
+        remaining_bucket = (remaining if remaining is not None else 5000) // 500
+        return (unavailable, busy, len(e["in_flight"]), -remaining_bucket, e.get("last_picked", 0))
+
+    def pick(self, exclude=()):
+        """
+        选择下一个账号
+        Args:
+            exclude: 本次调用中已尝试过的仓库名
+        Returns:
+            账号字典 {"repo", "token"}，账号池为空时返回 None
+        """
+        now = time.time()
+        candidates = [a for a in self.pool if a["repo"] not in exclude]
+        if not candidates: return None
+        account = min(candidates, key=lambda a: self._score(a, now))
+        self._entry(account["repo"])["last_picked"] = now
+        return account
+
+    def is_available(self, account):
+        return not self._score(account, time.time())[0]
+
+    def update_rate_limit(self, account, headers):
+        """读取 X-RateLimit-* 响应头"""
+        if not headers: return
+        e = self._entry(account["repo"])
+        try:
+            if "X-RateLimit-Remaining" in headers:
+                e["rate_remaining"] = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset" in headers:
+                e["rate_reset"] = int(headers["X-RateLimit-Reset"])
+        except (TypeError, ValueError):
+            pass
+
+    def record_result(self, account, status_code, headers=None, run_id=None):
+        """
+        记录一次派发结果
+        Args:
+            status_code: HTTP 状态码，网络异常时传 None
+            run_id: 成功时用于标识进行中任务的 ID
+        """
+        now = time.time()
+        e = self._entry(account["repo"])
+        self.update_rate_limit(account, headers)
+        e["last_status"] = status_code
+
+        if status_code is not None and 200 <= status_code < 300:
+            e["failures"] = 0
+            e["quarantine_until"] = 0
+            e["dispatches"] += 1
+            e["in_flight"].append({"id": run_id or f"dispatch-{int(now)}", "started": now})
+        else:
+            e["failures"] += 1
+            if status_code == 403 and e["rate_remaining"] == 0 and e["rate_reset"] > now:
+                # 限流: 隔离到额度重置
+                e["quarantine_until"] = e["rate_reset"]
+            elif status_code in AUTH_FAILURE_CODES or e["failures"] >= 2:
+                delay = min(QUARANTINE_BASE * (2 ** (e["failures"] - 1)), QUARANTINE_MAX)
+                e["quarantine_until"] = now + delay
+                logger.warning(f"GitHub 账号 {account['repo']} 隔离 {int(delay)}s (状态: {status_code})")
+        self._save()
+
+    def release(self, account_repo, run_id):
+        """推流结束后释放进行中的任务"""
+        e = self.state.get(account_repo)
+        if not e: return
+        before = len(e["in_flight"])
+        e["in_flight"] = [r for r in e["in_flight"] if r["id"] != run_id]
+        if len(e["in_flight"]) != before: self._save()
+
+    def rename_run(self, account_repo, old_id, new_id):
+        """将派发占位 ID 替换为真实的 Workflow Run ID"""
+        e = self.state.get(account_repo)
+        if not e: return
+        for r in e["in_flight"]:
+            if r["id"] == old_id: r["id"] = new_id
+        self._save()
+
+    def summary(self):
+        """返回 (可用账号数, 进行中推流数)"""
+        now = time.time()
+        available = sum(1 for a in self.pool if not self._score(a, now)[0])
+        running = sum(len(self._entry(a["repo"])["in_flight"]) for a in self.pool)
+        return available, running
+
+scheduler = AccountScheduler(GITHUB_POOL)
@@ -10,20 +10,34 @@ from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKe
 from telegram.ext import ContextTypes, CallbackQueryHandler
 from telegram.constants import ParseMode
 
-from .config import MAIN_MENU, ADMIN_MENU, STREAM_MENU, check_auth, get_account_count, ADMIN_ID, TG_RTMP_URL_ENV
+from .config import MAIN_MENU, ADMIN_MENU, STREAM_MENU, check_auth, get_account_count, get_admin_chat_id, ADMIN_ID, TG_RTMP_URL_ENV
 from .system import (
     get_system_stats, 
     get_log_file_path,
-    get_public_url, 
     get_admin_pass, 
     restart_pm2_services, 
     add_aria2_task,
     check_services_health,
-    get_aria2_status
+    get_aria2_status,
+    escape_text
 )
 from .github import trigger_stream_action
 from .stream_manager import add_key, delete_key, get_key, get_all_keys, get_default_key
-from .alist_api import fetch_file_list
+from .dir_cache import dir_cache, get_page, get_cache_stats_text
+from .prefetch import schedule_prefetch, cancel_prefetch
+from .watchdog import watchdog
+from .tunnel import tunnel_tracker, resolve_public_url
+from .executor import run_blocking, get_executor_stats_text, ExecutorBusy
+from .url_resolver import get_resolver_stats_text
+from .alist_api import token_manager
+from .stream_registry import registry
+from .github_pool import scheduler
+from .folder_download import download_folder
+from .search_index import search_index
+from .path_intern import path_table
+from .encode_profiles import describe_profile
+from .radio_playlist import build_manifest
+from .stream_queue import list_folder_videos, build_queue_manifest, is_video, MAX_QUEUE
 
 logger = logging.getLogger(__name__)
 
@@ -33,10 +47,6 @@ def escape_md(text):
     if not text: return ""
     return str(text).replace("`", "'")
 
-def escape_text(text):
-    if not text: return ""
-    return str(text).replace("_", "\\_").replace("*", "\\*").replace("`", "\\`").replace("[", "\\[")
-
 async def ensure_auth(update: Update):
     """验证权限并发送提示"""
     user_id = update.effective_user.id
@@ -82,7 +92,7 @@ async def trigger_stream_logic(update: Update, context: ContextTypes.DEFAULT_TYP
     else:
         target_rtmp = base_rtmp
 
-    base_url = get_public_url()
+    base_url = await resolve_public_url()
     if not base_url:
         await context.bot.send_message(chat_id=chat_id, text="❌ 隧道未就绪 (Cloudflared 正在启动或重连中，请稍后再试)")
         return
@@ -96,20 +106,44 @@ async def trigger_stream_logic(update: Update, context: ContextTypes.DEFAULT_TYP
         if not audio_path or not image_path:
             await context.bot.send_message(chat_id=chat_id, text="❌ Radio 模式参数不全 (需音频+背景)")
             return
+        # ⚡️ 在本机解析并签名音频 / 背景图链接，Runner 直接按清单拉取
+        manifest, (audio_count, image_count), err = await build_manifest(audio_path, image_path, base_url)
+        if err:
+            await context.bot.send_message(chat_id=chat_id, text=f"❌ Radio 清单解析失败: {err}")
+            return
         extra_payload = {
             "mode": "radio",
             "audio_path": audio_path,
             "image_path": image_path,
-            "base_url": base_url 
+            "base_url": base_url,
+            "manifest": manifest
         }
         path = "Radio Mode" # 占位符
 
+    # 队列模式: 解析所有条目的签名链接，一次派发连续播放
+    queue_paths = None
+    if mode == "queue":
+        selected = context.user_data.get('queue_selection', [])
+        if not selected:
+            await context.bot.send_message(chat_id=chat_id, text="❌ 播放队列为空")
+            return
+        manifest, queue_paths, err = await build_queue_manifest(selected, base_url)
+        if err:
+            await context.bot.send_message(chat_id=chat_id, text=f"❌ 队列解析失败: {err}")
+            return
+        extra_payload = {
+            "mode": "queue",
+            "base_url": base_url,
+            "manifest": manifest
+        }
+        path = "Queue Mode" # 占位符
+
     # 发送状态提示
     status_msg = await context.bot.send_message(chat_id=chat_id, text="⏳ 正在请求 GitHub Action...")
     
-    # ⚡️ 异步执行阻塞的 GitHub API 请求
-    loop = asyncio.get_running_loop()
-    success, msg, _ = await loop.run_in_executor(None, lambda: trigger_stream_action(base_url, path, target_rtmp, extra_payload))
+    success, msg, _ = await trigger_stream_action(base_url, path, target_rtmp, extra_payload, queue_paths)
+    if success and mode == "radio":
+        msg += f"\n🎶 曲目 `{audio_count}` 首 | 背景图 `{image_count}` 张"
     
     # 删除状态提示，发送最终结果
     try:
@@ -121,6 +155,12 @@ async def trigger_stream_logic(update: Update, context: ContextTypes.DEFAULT_TYP
 # --- 全局错误处理 ---
 
 async def global_error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if isinstance(context.error, ExecutorBusy):
+        # 执行器排队已满，只提示用户，不当作内部错误上报
+        if isinstance(update, Update) and update.effective_message:
+            try: await update.effective_message.reply_text(f"⏳ {context.error}")
+            except: pass
+        return
     logger.error("Exception while handling an update:", exc_info=context.error)
     if ADMIN_ID:
         try:
@@ -134,9 +174,8 @@ ITEMS_PER_PAGE = 10
 
 async def render_browser(update: Update, context: ContextTypes.DEFAULT_TYPE, path="/", page=0, edit_msg=False):
     try:
-        # ⚡️ 异步执行阻塞的 Alist API 请求
-        loop = asyncio.get_running_loop()
-        files, err = await loop.run_in_executor(None, fetch_file_list, path, 1, 200)
+        # ⚡️ 走目录缓存; 超大目录自动切换为服务端分页，只拉取当前窗口
+        current_files, total_items, page, err = await get_page(path, page, ITEMS_PER_PAGE)
         
         if err:
             safe_path = escape_md(path)
@@ -148,43 +187,31 @@ async def render_browser(update: Update, context: ContextTypes.DEFAULT_TYPE, pat
                 await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
             return
 
-        # ⚡️ 防御性编程: 确保 files 是列表
-        if files is None: files = []
-        
-        files.sort(key=lambda x: (not x.get('is_dir', False), x.get('name', '')))
-
-        total_items = len(files)
+        # ⚡️ 防御性编程: 确保 current_files 是列表
+        if current_files is None: current_files = []
         total_pages = math.ceil(total_items / ITEMS_PER_PAGE)
-        if page >= total_pages: page = max(0, total_pages - 1)
-        if page < 0: page = 0
-        
-        start_idx = page * ITEMS_PER_PAGE
-        end_idx = start_idx + ITEMS_PER_PAGE
-        current_files = files[start_idx:end_idx]
-
-        context.user_data['browser'] = {
-            'path': path,
-            'page': page,
-            'files': current_files 
-        }
+
+        # callback_data 只携带路径 ID 与页码，旧键盘在重渲染 / 重启后仍可正确解析
+        dir_id = path_table.intern(path, True)
 
         keyboard = []
-        for idx, f in enumerate(current_files):
+        for f in current_files:
             icon = "📂" if f['is_dir'] else "📄"
             name = f.get('name', '未命名')
-            keyboard.append([InlineKeyboardButton(f"{icon} {name}", callback_data=f"br:clk:{idx}")])
+            item_id = path_table.intern_item(path, f)
+            keyboard.append([InlineKeyboardButton(f"{icon} {name}", callback_data=f"br:clk:{item_id}:{page}")])
 
         nav_row = []
         if page > 0:
-            nav_row.append(InlineKeyboardButton("⬅️ 上一页", callback_data="br:pg:prev"))
+            nav_row.append(InlineKeyboardButton("⬅️ 上一页", callback_data=f"br:pg:{dir_id}:{page - 1}"))
         
         if path != "/":
-            nav_row.append(InlineKeyboardButton("🆙 返回上级", callback_data="br:nav:up"))
+            nav_row.append(InlineKeyboardButton("🆙 返回上级", callback_data=f"br:nav:up:{dir_id}"))
         else:
             nav_row.append(InlineKeyboardButton("🏠 根目录", callback_data="br:nav:root"))
 
         if page < total_pages - 1:
-            nav_row.append(InlineKeyboardButton("下一页 ➡️", callback_data="br:pg:next"))
+            nav_row.append(InlineKeyboardButton("下一页 ➡️", callback_data=f"br:pg:{dir_id}:{page + 1}"))
         
         keyboard.append(nav_row)
         keyboard.append([InlineKeyboardButton("❌ 关闭", callback_data="br:close")])
@@ -201,10 +228,22 @@ async def render_browser(update: Update, context: ContextTypes.DEFAULT_TYPE, pat
             if image_path: status_text += f"\n🖼 背景: `{escape_md(os.path.basename(image_path))}`"
             
             if audio_path and image_path:
-                keyboard.insert(0, [InlineKeyboardButton("🚀 启动 Radio 推流", callback_data="br:start_radio")])
+                keyboard.insert(0, [InlineKeyboardButton("🚀 启动 Radio 推流", callback_data=f"br:start_radio:{dir_id}:{page}")])
             else:
                 keyboard.insert(0, [InlineKeyboardButton("⚠️ 需选音频+图片", callback_data="br:noop")])
 
+        # 播放队列状态
+        queue_sel = context.user_data.get('queue_selection', [])
+        if queue_sel:
+            status_text += f"\n\n🎬 *播放队列:* {len(queue_sel)} 个"
+            for p in queue_sel[:3]:
+                status_text += f"\n• `{escape_md(os.path.basename(p))}`"
+            if len(queue_sel) > 3: status_text += "\n• …"
+            keyboard.insert(0, [
+                InlineKeyboardButton(f"▶️ 推流队列 ({len(queue_sel)})", callback_data=f"br:start_queue:{dir_id}:{page}"),
+                InlineKeyboardButton("🗑 清空队列", callback_data=f"br:q_clear:{dir_id}:{page}"),
+            ])
+
         markup = InlineKeyboardMarkup(keyboard)
         safe_path = escape_md(path)
         text = f"📂 *当前路径:* `{safe_path}`\n📄 共 {total_items} 项 (第 {page+1}/{total_pages or 1} 页){status_text}"
@@ -213,6 +252,9 @@ async def render_browser(update: Update, context: ContextTypes.DEFAULT_TYPE, pat
             await update.callback_query.edit_message_text(text, reply_markup=markup, parse_mode=ParseMode.MARKDOWN)
         else:
             await update.message.reply_text(text, reply_markup=markup, parse_mode=ParseMode.MARKDOWN)
+
+        # ⚡️ 后台预热下一页与可见子目录
+        schedule_prefetch(update.effective_user.id, path, page, ITEMS_PER_PAGE, total_items, current_files)
     except Exception as e:
         logger.error(f"Render browser error: {e}")
         err_text = f"❌ 渲染界面出错: {str(e)}"
@@ -223,8 +265,12 @@ async def render_browser(update: Update, context: ContextTypes.DEFAULT_TYPE, pat
                 await update.message.reply_text(err_text)
         except: pass
 
+def _parent_of(path):
+    parent = os.path.dirname(path.rstrip('/'))
+    return parent or "/"
+
 async def browser_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """处理浏览器按钮点击"""
+    """处理浏览器按钮点击 (callback_data: br:<动作>[:<参数>...])"""
     query = update.callback_query
     
     try:
@@ -235,13 +281,9 @@ async def browser_callback_handler(update: Update, context: ContextTypes.DEFAULT
         parts = data.split(':')
         if len(parts) < 2: return
         action = parts[1]
-        
-        browser_data = context.user_data.get('browser', {})
-        current_path = browser_data.get('path', '/')
-        current_page = browser_data.get('page', 0)
-        current_files = browser_data.get('files', [])
 
         if action == "close":
+            cancel_prefetch(update.effective_user.id)
             await query.delete_message()
             return
         
@@ -249,117 +291,158 @@ async def browser_callback_handler(update: Update, context: ContextTypes.DEFAULT
             await query.answer("请继续选择缺少的资源 (音频或图片)", show_alert=True)
             return
 
+        if action == "nav" and parts[2] == "root":
+            await render_browser(update, context, "/", 0, True)
+            return
+
+        # 其余动作都携带路径 ID (act:<子动作>:<ID> 的 ID 在第 4 段)
+        id_pos = 3 if action in ("act", "nav") else 2
+        if len(parts) <= id_pos: return
+        entry = path_table.resolve(parts[id_pos])
+        if not entry:
+            await query.answer("列表已过期，请重新打开", show_alert=True)
+            return
+        target_path = entry['path']
+        page = int(parts[id_pos + 1]) if len(parts) > id_pos + 1 else 0
+
         if action == "start_radio":
             await query.message.reply_text("🚀 启动中...", parse_mode=ParseMode.MARKDOWN)
             await trigger_stream_logic(update, context, None, mode="radio")
             context.user_data['radio_selection'] = {}
-            await render_browser(update, context, current_path, current_page, True)
+            await render_browser(update, context, target_path, page, True)
+            return
+
+        if action == "start_queue":
+            await query.message.reply_text("🚀 启动队列推流中...")
+            await trigger_stream_logic(update, context, None, mode="queue")
+            context.user_data['queue_selection'] = []
+            await render_browser(update, context, target_path, page, True)
+            return
+
+        if action == "q_clear":
+            context.user_data['queue_selection'] = []
+            await render_browser(update, context, target_path, page, True)
             return
 
         if action == "nav":
-            target = parts[2]
-            if target == "root":
-                await render_browser(update, context, "/", 0, True)
-            elif target == "up":
-                parent = os.path.dirname(current_path.rstrip('/'))
-                if not parent: parent = "/"
-                await render_browser(update, context, parent, 0, True)
+            # nav:up:<当前目录 ID>
+            await render_browser(update, context, _parent_of(target_path), 0, True)
             return
 
         if action == "pg":
-            direction = parts[2]
-            new_page = current_page - 1 if direction == "prev" else current_page + 1
-            await render_browser(update, context, current_path, new_page, True)
+            await render_browser(update, context, target_path, page, True)
             return
 
+        item_id = parts[id_pos]
+        safe_name = escape_md(os.path.basename(target_path.rstrip('/')) or "/")
+
         if action == "clk":
-            idx = int(parts[2])
-            if idx >= len(current_files): 
-                await query.answer("文件列表已过期，请刷新", show_alert=True)
-                return
-            
-            item = current_files[idx]
-            safe_name = escape_md(item['name'])
-            
-            if item['is_dir']:
+            back = InlineKeyboardButton("🔙 返回", callback_data=f"br:act:back:{item_id}:{page}")
+            if entry.get('is_dir'):
                 keyboard = [
-                    [InlineKeyboardButton("📂 进入目录", callback_data=f"br:enter:{idx}")],
-                    [InlineKeyboardButton("📻 设为广播音频源", callback_data=f"br:set_audio:{idx}")],
-                    [InlineKeyboardButton("🖼 设为广播背景", callback_data=f"br:set_image:{idx}")],
-                    [InlineKeyboardButton("🔙 返回", callback_data="br:act:back")]
+                    [InlineKeyboardButton("📂 进入目录", callback_data=f"br:enter:{item_id}")],
+                    [InlineKeyboardButton("⬇️ 下载整个目录", callback_data=f"br:dl_dir:{item_id}")],
+                    [InlineKeyboardButton("🎬 目录视频加入队列", callback_data=f"br:q_dir:{item_id}:{page}")],
+                    [InlineKeyboardButton("📻 设为广播音频源", callback_data=f"br:set_audio:{item_id}:{page}")],
+                    [InlineKeyboardButton("🖼 设为广播背景", callback_data=f"br:set_image:{item_id}:{page}")],
+                    [back]
                 ]
                 markup = InlineKeyboardMarkup(keyboard)
                 msg = f"📂 *选中目录:*\n`{safe_name}`"
                 await query.edit_message_text(msg, reply_markup=markup, parse_mode=ParseMode.MARKDOWN)
             else:
                 keyboard = [
-                    [InlineKeyboardButton("📺 视频推流", callback_data=f"br:act:stream:{idx}")],
-                    [InlineKeyboardButton("📻 设为广播音频", callback_data=f"br:set_audio:{idx}")],
-                    [InlineKeyboardButton("🖼 设为广播背景", callback_data=f"br:set_image:{idx}")],
-                    [InlineKeyboardButton("⬇️ 下载", callback_data=f"br:act:dl:{idx}")],
-                    [InlineKeyboardButton("🔙 返回", callback_data="br:act:back")]
+                    [InlineKeyboardButton("📺 视频推流", callback_data=f"br:act:stream:{item_id}")],
+                    [InlineKeyboardButton("➕ 加入播放队列", callback_data=f"br:q_add:{item_id}:{page}")],
+                    [InlineKeyboardButton("📻 设为广播音频", callback_data=f"br:set_audio:{item_id}:{page}")],
+                    [InlineKeyboardButton("🖼 设为广播背景", callback_data=f"br:set_image:{item_id}:{page}")],
+                    [InlineKeyboardButton("⬇️ 下载", callback_data=f"br:act:dl:{item_id}")],
+                    [back]
                 ]
                 markup = InlineKeyboardMarkup(keyboard)
-                size_mb = round(item.get('size', 0) / (1024*1024), 2)
+                size_mb = round((entry.get('size') or 0) / (1024*1024), 2)
                 msg = f"📄 *选中文件:*\n`{safe_name}`\n📏 {size_mb} MB"
                 await query.edit_message_text(msg, reply_markup=markup, parse_mode=ParseMode.MARKDOWN)
             return
         
         if action == "enter":
-            idx = int(parts[2])
-            if idx < len(current_files):
-                item = current_files[idx]
-                new_path = os.path.join(current_path, item['name']).replace("\\", "/")
-                await render_browser(update, context, new_path, 0, True)
+            await render_browser(update, context, target_path, 0, True)
+            return
+
+        if action == "dl_dir":
+            base_url = await resolve_public_url()
+            if not base_url:
+                await query.message.reply_text("❌ 隧道未启动")
+                return
+            dir_cache.invalidate(target_path)
+            progress_msg = await query.message.reply_text(f"🔍 正在扫描目录: `{safe_name}`", parse_mode=ParseMode.MARKDOWN)
+
+            async def on_progress(dirs, files):
+                # dirs 为 None 表示扫描完成，正在提交到 Aria2
+                text = f"📤 扫描完成，正在提交 {files} 个文件到 Aria2..." if dirs is None else f"🔍 已扫描 {dirs} 个目录，发现 {files} 个文件..."
+                try:
+                    await progress_msg.edit_text(text)
+                except Exception: pass
+
+            success, msg = await download_folder(target_path, base_url, on_progress)
+            await progress_msg.edit_text(f"📥 目录下载:\n{msg}", parse_mode=ParseMode.MARKDOWN)
             return
 
-        if action == "set_audio":
-            idx = int(parts[2])
-            if idx < len(current_files):
-                item = current_files[idx]
-                full_path = os.path.join(current_path, item['name']).replace("\\", "/")
-                if 'radio_selection' not in context.user_data: context.user_data['radio_selection'] = {}
-                context.user_data['radio_selection']['audio'] = full_path
-                await query.answer("✅ 已设为音频源", show_alert=False)
-                await render_browser(update, context, current_path, current_page, True)
+        if action in ("set_audio", "set_image"):
+            key = 'audio' if action == "set_audio" else 'image'
+            if 'radio_selection' not in context.user_data: context.user_data['radio_selection'] = {}
+            context.user_data['radio_selection'][key] = target_path
+            await query.answer("✅ 已设为音频源" if key == 'audio' else "✅ 已设为背景源", show_alert=False)
+            await render_browser(update, context, _parent_of(target_path), page, True)
             return
 
-        if action == "set_image":
-            idx = int(parts[2])
-            if idx < len(current_files):
-                item = current_files[idx]
-                full_path = os.path.join(current_path, item['name']).replace("\\", "/")
-                if 'radio_selection' not in context.user_data: context.user_data['radio_selection'] = {}
-                context.user_data['radio_selection']['image'] = full_path
-                await query.answer("✅ 已设为背景源", show_alert=False)
-                await render_browser(update, context, current_path, current_page, True)
+        if action in ("q_add", "q_dir"):
+            queue = context.user_data.setdefault('queue_selection', [])
+            if action == "q_dir":
+                paths, err = await list_folder_videos(target_path)
+                if err:
+                    await query.answer(f"❌ 读取目录失败: {err}"[:200], show_alert=True)
+                    return
+            else:
+                paths = [target_path]
+            added = 0
+            for p in paths:
+                if len(queue) >= MAX_QUEUE: break
+                if p in queue or not is_video(p): continue
+                queue.append(p)
+                added += 1
+            if added:
+                await query.answer(f"✅ 已加入 {added} 个，队列共 {len(queue)} 个")
+            else:
+                await query.answer("⚠️ 没有可加入的视频 (不是视频、已在队列中或队列已满)", show_alert=True)
+            await render_browser(update, context, _parent_of(target_path), page, True)
             return
 
         if action == "act":
             sub_act = parts[2]
             if sub_act == "back":
-                await render_browser(update, context, current_path, current_page, True)
+                # act:back:<条目 ID>:<页码> 返回条目所在目录
+                await render_browser(update, context, _parent_of(target_path), page, True)
                 return
             
-            idx = int(parts[3])
-            if idx >= len(current_files): return
-            item = current_files[idx]
-            full_path = os.path.join(current_path, item['name']).replace("\\", "/")
+            full_path = target_path
+            # 下载/推流会改变文件状态，丢弃相关目录缓存
+            dir_cache.invalidate(_parent_of(full_path))
+            dir_cache.invalidate(full_path)
             
             if sub_act == "stream":
                 context.args = [full_path] 
-                safe_name = escape_md(item['name'])
                 await query.message.reply_text(f"🚀 准备推流: `{safe_name}`", parse_mode=ParseMode.MARKDOWN)
                 await trigger_stream_logic(update, context, full_path)
                 
             elif sub_act == "dl":
-                base_url = get_public_url()
+                base_url = await resolve_public_url()
                 if not base_url:
                     await query.message.reply_text("❌ 隧道未启动")
                     return
                 from urllib.parse import quote
                 dl_url = f"{base_url}/d{quote(full_path)}"
-                success, msg = add_aria2_task(dl_url)
+                success, msg = await add_aria2_task(dl_url)
                 if not success: msg = escape_text(msg)
                 await query.message.reply_text(f"📥 下载任务:\n{msg}", parse_mode=ParseMode.MARKDOWN)
 
@@ -391,7 +474,7 @@ async def download_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args: 
         await update.message.reply_text("用法: `/dl http://url`", parse_mode=ParseMode.MARKDOWN)
         return
-    success, msg = add_aria2_task(context.args[0])
+    success, msg = await add_aria2_task(context.args[0])
     if not success: msg = escape_text(msg)
     await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
 
@@ -405,6 +488,91 @@ async def trigger_stream(update: Update, context: ContextTypes.DEFAULT_TYPE):
     key = args[1] if len(args) > 1 else None
     await trigger_stream_logic(update, context, path, key)
 
+async def find_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """在本地索引中搜索文件"""
+    if not await ensure_auth(update): return
+    query = " ".join(context.args or []).strip()
+    if not query:
+        count, last = await search_index.stats()
+        hint = f"📇 已索引 `{count}` 个条目" if count else "📇 索引尚未建立，后台爬取中..."
+        await update.message.reply_text(f"用法: `/find 关键词`\n{hint}", parse_mode=ParseMode.MARKDOWN)
+        return
+
+    results = await search_index.search(query)
+    if not results:
+        msg = "🔍 没有找到匹配的文件"
+        if search_index.crawling: msg += " (索引更新中)"
+        await update.message.reply_text(msg)
+        return
+
+    # 结果按钮复用浏览器的点击逻辑 (路径 ID 编码在 callback_data 中)
+    keyboard = []
+    for r in results:
+        icon = "📂" if r['is_dir'] else "📄"
+        item_id = path_table.intern(r['path'], bool(r['is_dir']), r['size'])
+        keyboard.append([InlineKeyboardButton(f"{icon} {r['path']}"[:60], callback_data=f"br:clk:{item_id}:0")])
+    keyboard.append([InlineKeyboardButton("❌ 关闭", callback_data="br:close")])
+    await update.message.reply_text(
+        f"🔍 *搜索:* `{escape_md(query)}` ({len(results)} 条)",
+        reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.MARKDOWN,
+    )
+
+async def index_crawl_job(context: ContextTypes.DEFAULT_TYPE):
+    """定时重建文件索引"""
+    try:
+        await search_index.crawl()
+    except Exception as e:
+        logger.warning(f"文件索引爬取失败: {e}")
+
+async def streams_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """列出进行中的推流"""
+    if not await ensure_auth(update): return
+    await registry.poll()
+    active = registry.active()
+    if not active:
+        await update.message.reply_text("💤 当前没有进行中的推流")
+        return
+    msg = "📡 *进行中的推流:*\n"
+    for s in active:
+        remain = int(registry.remaining_seconds(s) // 60)
+        status = {"dispatched": "⏳ 等待启动", "queued": "⏳ 排队中", "in_progress": "🔴 直播中"}.get(s["status"], s["status"])
+        msg += f"\n🆔 `{s['id']}` {status}\n"
+        msg += f"📄 `{escape_md(s['label'])}`\n"
+        if s.get("queue"):
+            msg += "🎬 队列: " + " → ".join(f"`{escape_md(n)}`" for n in s["queue"][:5])
+            if len(s["queue"]) > 5: msg += f" … 共 {len(s['queue'])} 个"
+            msg += "\n"
+        if s.get("profile"):
+            msg += f"🎚 `{escape_md(describe_profile(s['profile']))}`"
+            if s.get("route"): msg += " | " + ("🔗 直链" if s["route"] == "direct" else "🚇 隧道")
+            msg += "\n"
+        msg += f"👤 `{escape_md(s['repo'])}` | ⏱ 剩余约 {remain // 60}h{remain % 60}m\n"
+    msg += "\n停止: `/stopstream <编号>`"
+    await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN, disable_web_page_preview=True)
+
+async def stop_stream_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """取消指定推流的 Workflow Run"""
+    if not await ensure_auth(update): return
+    if not context.args or not context.args[0].isdigit():
+        await update.message.reply_text("用法: `/stopstream <编号>` (编号见 /streams)", parse_mode=ParseMode.MARKDOWN)
+        return
+    success, msg = await registry.cancel(int(context.args[0]))
+    await update.message.reply_text(("🛑 " if success else "❌ ") + msg)
+
+async def poll_streams_job(context: ContextTypes.DEFAULT_TYPE):
+    """定时刷新推流状态 (无进行中推流时不发请求)"""
+    try:
+        await registry.poll()
+    except Exception as e:
+        logger.warning(f"刷新推流状态失败: {e}")
+
+async def alist_token_job(context: ContextTypes.DEFAULT_TYPE):
+    """定时检查 Alist Token，临近过期时提前刷新"""
+    try:
+        await token_manager.refresh_if_needed()
+    except Exception as e:
+        logger.warning(f"刷新 Alist Token 失败: {e}")
+
 async def add_key_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await ensure_auth(update): return
     args = context.args
@@ -468,10 +636,13 @@ async def send_del_key_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("用法: `/delkey 名称`", parse_mode=ParseMode.MARKDOWN)
 
 async def send_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(get_system_stats(), parse_mode=ParseMode.MARKDOWN)
+    # psutil 与端口探测为阻塞调用，放到专用执行器；账号池状态只在事件循环中读写
+    stats = await run_blocking(get_system_stats, scheduler.summary())
+    msg = stats + "\n" + get_cache_stats_text() + "\n" + get_resolver_stats_text() + "\n" + get_executor_stats_text()
+    await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
 
 async def send_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(get_aria2_status(), parse_mode=ParseMode.MARKDOWN)
+    await update.message.reply_text(await get_aria2_status(), parse_mode=ParseMode.MARKDOWN)
 
 async def send_logs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     log_file = get_log_file_path("alist")
@@ -481,18 +652,33 @@ async def send_logs(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def restart_services(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("⏳ 重启中...")
-    restart_pm2_services()
+    success, msg = await restart_pm2_services()
+    await update.message.reply_text(msg)
 
 async def send_admin_pass(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    pwd = get_admin_pass() or "未知"
+    pwd = await run_blocking(get_admin_pass) or "未知"
     await update.message.reply_text(f"🔑 `{escape_md(pwd)}`", parse_mode=ParseMode.MARKDOWN)
 
 async def send_download_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("发送 `/dl 链接` 下载，或使用「📂 文件」菜单。", parse_mode=ParseMode.MARKDOWN)
 
 async def send_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("📖 *指南*\n1. 使用「📂 文件」浏览网盘\n2. 点击文件可直接推流或下载\n3. /stream 手动推流", parse_mode=ParseMode.MARKDOWN)
+    await update.message.reply_text("📖 *指南*\n1. 使用「📂 文件」浏览网盘\n2. 点击文件可直接推流或下载\n3. /stream 手动推流\n4. /streams 查看推流，/stopstream 停止\n5. /find 关键词 搜索网盘文件\n6. 文件 / 目录菜单中「加入播放队列」，一次推流连续播放多个视频", parse_mode=ParseMode.MARKDOWN)
 
 async def monitor_services_job(context: ContextTypes.DEFAULT_TYPE):
-    # 简化的监控逻辑，防止阻塞
-    pass
+    """定时服务巡检: 全异步探测，只在状态变化时通知管理员"""
+    # 持久化路径表 (与巡检结果无关，巡检失败也照常保存)
+    await path_table.flush()
+    try:
+        alert = await watchdog.check()
+        # 顺便用 metrics 端口校验隧道地址
+        if watchdog.state.get("cloudflared"): await tunnel_tracker.verify()
+    except Exception as e:
+        logger.error(f"服务巡检失败: {e}")
+        return
+    admin_chat = get_admin_chat_id()
+    if alert and admin_chat:
+        try:
+            await context.bot.send_message(chat_id=admin_chat, text=alert, parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            logger.warning(f"发送巡检告警失败: {e}")
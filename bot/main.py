@@ -4,12 +4,22 @@ import asyncio
 import sys
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 from telegram.request import HTTPXRequest
-from .config import BOT_TOKEN, validate_config
+from .config import BOT_TOKEN, validate_config, get_admin_chat_id
+from .alist_api import close_client as close_alist_client, token_manager
+from .aria2_api import close_client as close_aria2_client
+from .aria2_events import run_subscriber as run_aria2_subscriber
+from .github_api import close_client as close_github_client
+from .executor import shutdown as shutdown_executor
+from .path_intern import path_table
+from .github_pool import scheduler
+from .stream_registry import registry
 from .handlers import (
     start, trigger_stream, download_command, handle_message, 
     global_error_handler, monitor_services_job,
     add_key_command, del_key_command, list_keys_command,
-    browser_command, browser_callback_handler 
+    browser_command, browser_callback_handler,
+    streams_command, stop_stream_command, poll_streams_job,
+    find_command, index_crawl_job, alist_token_job
 )
 
 # 配置日志到标准输出
@@ -21,6 +31,30 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+CONCURRENT_UPDATES = 16  # 同时处理的更新数上限
+
+async def on_startup(app):
+    """启动后台长连接任务"""
+    # 后台准备 Alist 密码与 Token，不阻塞启动
+    app.bot_data['alist_token_task'] = asyncio.create_task(token_manager.warm_up())
+    admin_chat = get_admin_chat_id()
+    if admin_chat:
+        # aria2 下载完成 / 出错实时推送给管理员
+        app.bot_data['aria2_events_task'] = asyncio.create_task(run_aria2_subscriber(app.bot, admin_chat))
+
+async def on_shutdown(app):
+    """退出时停止后台任务并释放连接池"""
+    for name in ('aria2_events_task', 'alist_token_task'):
+        task = app.bot_data.pop(name, None)
+        if task: task.cancel()
+    await close_alist_client()
+    await close_aria2_client()
+    await close_github_client()
+    await scheduler.flush()
+    await registry.flush()
+    shutdown_executor()
+    path_table.save()
+
 if __name__ == '__main__':
     print("---------------------------------------")
     print("🚀 Termux Bot 进程正在启动...")
@@ -38,7 +72,13 @@ if __name__ == '__main__':
             connect_timeout=30.0 # 增加连接超时
         )
 
-        app = ApplicationBuilder().token(BOT_TOKEN).request(request).build()
+        # 并发处理更新: 重启服务 / 扫描目录 / ffprobe / GitHub 派发等慢操作不再阻塞其他用户的点击
+        app = (
+            ApplicationBuilder().token(BOT_TOKEN).request(request)
+            .concurrent_updates(CONCURRENT_UPDATES)
+            .post_init(on_startup).post_shutdown(on_shutdown)
+            .build()
+        )
         
         # 1. 注册全局错误处理器
         app.add_error_handler(global_error_handler)
@@ -46,6 +86,12 @@ if __name__ == '__main__':
         # 2. 注册定时任务 (每 2 分钟检查一次服务状态)
         if app.job_queue:
             app.job_queue.run_repeating(monitor_services_job, interval=120, first=10)
+            # 刷新推流 Workflow 状态 (每分钟)
+            app.job_queue.run_repeating(poll_streams_job, interval=60, first=30)
+            # 后台增量刷新 Alist 文件索引 (每 30 分钟，受 INDEX_CRAWL_BUDGET 限制)
+            app.job_queue.run_repeating(index_crawl_job, interval=1800, first=120)
+            # Alist Token 过期前提前刷新 (每 10 分钟检查)
+            app.job_queue.run_repeating(alist_token_job, interval=600, first=300)
         
         # 3. 注册命令处理器
         app.add_handler(CommandHandler("start", start))
@@ -53,11 +99,16 @@ if __name__ == '__main__':
         app.add_handler(CommandHandler("dl", download_command))
         # 移除 usage 命令
         app.add_handler(CommandHandler("ls", browser_command)) 
+        app.add_handler(CommandHandler("find", find_command))
         
         # 新增推流密钥管理命令
         app.add_handler(CommandHandler("addkey", add_key_command))
         app.add_handler(CommandHandler("delkey", del_key_command))
         app.add_handler(CommandHandler("listkeys", list_keys_command))
+
+        # 推流管理
+        app.add_handler(CommandHandler("streams", streams_command))
+        app.add_handler(CommandHandler("stopstream", stop_stream_command))
         
         # 4. 注册 Callback (按钮点击) 处理器
         # 正则匹配 br: 开头的 callback
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import shutil
+import time
+from collections import OrderedDict
+from .url_resolver import url_resolver
+
+logger = logging.getLogger(__name__)
+
+# --- 媒体探测 ---
+# 推流前在本机用 ffprobe 读取源文件的编码信息 (走 127.0.0.1，不经过隧道)，
+# 按路径缓存结果，用于判断 Runner 端能否直接 -c copy 推流。
+
+PROBE_TIMEOUT = 20
+CACHE_TTL = 24 * 3600
+CACHE_MAX_ENTRIES = 256
+
+# 直通 (stream copy) 条件: RTMP/FLV 可直接承载，且不会让 Telegram 端解码吃力
+PASSTHROUGH_VIDEO_CODECS = ("h264",)
+PASSTHROUGH_AUDIO_CODECS = ("aac", "mp3")
+PASSTHROUGH_PIX_FMTS = ("yuv420p", "yuvj420p")
+PASSTHROUGH_MAX_WIDTH = 1920
+PASSTHROUGH_MAX_HEIGHT = 1080
+PASSTHROUGH_MAX_FPS = 60
+PASSTHROUGH_MAX_BITRATE = 8_000_000
+
+_cache = OrderedDict()  # path -> (probed_at, info)
+
+def ffprobe_available():
+    return shutil.which("ffprobe") is not None
+
+def _parse_fps(rate):
+    try:
+        num, den = rate.split("/")
+        return round(int(num) / int(den), 2) if int(den) else 0
+    except (AttributeError, ValueError):
+        return 0
+
+def _parse_probe(data):
+    video = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), {})
+    audio = next((s for s in data.get("streams", []) if s.get("codec_type") == "audio"), {})
+    fmt = data.get("format", {})
+    return {
+        "vcodec": video.get("codec_name"),
+        "width": int(video.get("width") or 0),
+        "height": int(video.get("height") or 0),
+        "fps": _parse_fps(video.get("avg_frame_rate") or video.get("r_frame_rate")),
+        "pix_fmt": video.get("pix_fmt"),
+        "acodec": audio.get("codec_name"),
+        "bitrate": int(fmt.get("bit_rate") or 0),
+        "duration": float(fmt.get("duration") or 0),
+    }
+
+async def probe_media(path):
+    """
+    探测媒体信息 (带缓存)
+    Returns:
+        信息字典，ffprobe 不可用或探测失败时返回 None
+    """
+    entry = _cache.get(path)
+    if entry and time.monotonic() - entry[0] < CACHE_TTL:
+        _cache.move_to_end(path)
+        return entry[1]
+    if not ffprobe_available(): return None
+
+    try:
+        url = await url_resolver.resolve_local(path)
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", "-print_format", "json",
+            "-show_format", "-show_streams", url,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), PROBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()  # 回收子进程，避免僵尸进程
+            logger.warning(f"ffprobe 超时: {path}")
+            return None
+        if proc.returncode != 0: return None
+        info = _parse_probe(json.loads(stdout or b"{}"))
+    except Exception as e:
+        logger.warning(f"ffprobe 失败 {path}: {e}")
+        return None
+
+    _cache[path] = (time.monotonic(), info)
+    _cache.move_to_end(path)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return info
+
+def is_passthrough_compatible(info):
+    """源文件能否不转码直接推流"""
+    if not info: return False
+    return (
+        info["vcodec"] in PASSTHROUGH_VIDEO_CODECS
+        and info["acodec"] in PASSTHROUGH_AUDIO_CODECS
+        and info["pix_fmt"] in PASSTHROUGH_PIX_FMTS
+        and 0 < info["width"] <= PASSTHROUGH_MAX_WIDTH
+        and 0 < info["height"] <= PASSTHROUGH_MAX_HEIGHT
+        and info["fps"] <= PASSTHROUGH_MAX_FPS
+        and (info["bitrate"] == 0 or info["bitrate"] <= PASSTHROUGH_MAX_BITRATE)
+    )
+
+def describe_media(info):
+    """简短的媒体描述，用于推流提示"""
+    if not info: return ""
+    return f"{info['vcodec']}/{info['acodec']} {info['width']}x{info['height']}@{info['fps']:g}fps"
@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import logging
+from collections import OrderedDict
+from .storage import data_path, atomic_write_json, read_json
+from .executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# --- 路径驻留表 ---
+# 把 Alist 路径映射为短 ID 放进 callback_data，按钮不再依赖 user_data 中的列表。
+# ID 由路径哈希得到 (同一路径永远是同一个 ID)，表按 LRU 限制大小，并在重启间持久化。
+
+STATE_FILE = data_path("path_table.json")
+MAX_ENTRIES = 5000
+
+def path_id(path):
+    """路径 -> 8 字符 ID (48 位哈希，base64url)"""
+    digest = hashlib.sha1(path.encode("utf-8")).digest()[:6]
+    return base64.urlsafe_b64encode(digest).decode()
+
+class PathTable:
+    def __init__(self, state_file=STATE_FILE, max_entries=MAX_ENTRIES):
+        self.state_file = state_file
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> {"path", "is_dir", "size"}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        data = read_json(self.state_file, [])
+        if isinstance(data, list):
+            for entry in data[-self.max_entries:]:
+                if isinstance(entry, dict) and entry.get("path"):
+                    self._entries[path_id(entry["path"])] = entry
+
+    def intern(self, path, is_dir=None, size=None):
+        """登记路径并返回 ID"""
+        pid = path_id(path)
+        entry = self._entries.get(pid)
+        if entry is None or entry["path"] != path:
+            entry = {"path": path, "is_dir": is_dir, "size": size}
+            self._entries[pid] = entry
+            self._dirty = True
+        else:
+            if is_dir is not None and entry.get("is_dir") != is_dir:
+                entry["is_dir"] = is_dir
+                self._dirty = True
+            if size is not None and entry.get("size") != size:
+                entry["size"] = size
+                self._dirty = True
+        self._entries.move_to_end(pid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return pid
+
+    def intern_item(self, parent, item):
+        """登记目录列表中的条目"""
+        path = parent.rstrip('/') + '/' + item['name']
+        return self.intern(path, bool(item.get('is_dir')), item.get('size'))
+
+    def resolve(self, pid):
+        """ID -> 条目字典，已被淘汰时返回 None"""
+        entry = self._entries.get(pid)
+        if entry: self._entries.move_to_end(pid)
+        return entry
+
+    def save(self):
+        """同步写盘 (退出时执行器已关闭时调用)"""
+        if not self._dirty: return
+        try:
+            atomic_write_json(self.state_file, list(self._entries.values()))
+            self._dirty = False
+        except Exception as e:
+            logger.warning(f"保存路径表失败: {e}")
+
+    async def flush(self):
+        """定时任务调用: 在事件循环上取快照，序列化与写盘放到执行器线程"""
+        if not self._dirty: return
+        snapshot = [dict(entry) for entry in self._entries.values()]
+        self._dirty = False
+        try:
+            await run_blocking(atomic_write_json, self.state_file, snapshot)
+        except Exception as e:
+            self._dirty = True
+            logger.warning(f"保存路径表失败: {e}")
+
+path_table = PathTable()
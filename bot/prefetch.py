@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import os
+from .dir_cache import get_page
+
+logger = logging.getLogger(__name__)
+
+# --- 浏览器预取 ---
+# 渲染完一页后，在后台预热 "下一页" 和当前页前 N 个子目录的第一页，
+# 让下一次点击直接命中目录缓存。
+
+PREFETCH_CONCURRENCY = 2   # 全局同时进行的预取请求数
+PREFETCH_CHILD_DIRS = 3    # 每次预取的子目录数量
+
+_semaphore = None
+_tasks = {}  # owner (用户 ID) -> asyncio.Task
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+    return _semaphore
+
+async def _warm(path, page, page_size):
+    async with _get_semaphore():
+        _, _, _, err = await get_page(path, page, page_size, record_stats=False)
+        if err: logger.debug(f"预取失败 {path} p{page}: {err}")
+
+async def _run(path, page, page_size, total_items, items):
+    targets = []
+    if (page + 1) * page_size < total_items:
+        targets.append((path, page + 1))
+    dirs = [i for i in items if i.get('is_dir')][:PREFETCH_CHILD_DIRS]
+    for d in dirs:
+        child = os.path.join(path, d['name']).replace("\\", "/")
+        targets.append((child, 0))
+
+    # 信号量限制并发；外层任务被取消时 gather 会一并取消所有子请求
+    await asyncio.gather(*(_warm(p, pg, page_size) for p, pg in targets), return_exceptions=True)
+
+def schedule_prefetch(owner, path, page, page_size, total_items, items):
+    """
+    为某个用户安排预取，新的调用会取消该用户尚未完成的旧预取
+    """
+    cancel_prefetch(owner)
+    task = asyncio.create_task(_run(path, page, page_size, total_items, items))
+    _tasks[owner] = task
+    task.add_done_callback(lambda t: _tasks.pop(owner, None) if _tasks.get(owner) is t else None)
+
+def cancel_prefetch(owner):
+    task = _tasks.pop(owner, None)
+    if task and not task.done():
+        task.cancel()
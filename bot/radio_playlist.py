@@ -0,0 +1,64 @@
+import base64
+import json
+import logging
+import posixpath
+import zlib
+from .alist_api import fetch_all_files, get_file_info, get_token
+from .url_resolver import signed_path
+
+logger = logging.getLogger(__name__)
+
+# --- Radio 播放清单 ---
+# Bot 与 Alist 同机，直接在本地解析音频 / 背景图目录并生成带签名的 /d 链接，
+# 压缩成一个紧凑清单放进 client_payload，Runner 无需再经隧道分页爬取目录。
+
+AUDIO_EXTS = ('.mp3', '.flac', '.wav', '.m4a', '.aac', '.ogg')
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+MAX_AUDIO = 500   # repository_dispatch 请求体有大小限制，清单条目需封顶
+MAX_IMAGES = 60
+
+async def _resolve(path, exts, limit, token):
+    """
+    单个文件直接返回，目录则列出匹配扩展名的文件
+    Returns:
+        (paths, err)
+    """
+    info = await get_file_info(path)
+    if not info or info.get("code") != 200:
+        return [], f"无法读取 {path}: {(info or {}).get('message', '连接失败')}"
+    data = info.get("data") or {}
+    if not data.get("is_dir"):
+        return [signed_path(path, data.get("sign"), token)], None
+
+    items, err = await fetch_all_files(path)
+    if err: return [], err
+    paths = [
+        signed_path(posixpath.join(path, it['name']), it.get('sign'), token)
+        for it in items
+        if not it.get('is_dir') and it['name'].lower().endswith(exts)
+    ]
+    return paths[:limit], None
+
+def encode_manifest(manifest):
+    return base64.b64encode(zlib.compress(json.dumps(manifest, separators=(",", ":")).encode(), 9)).decode()
+
+async def build_manifest(audio_path, image_path, base_url):
+    """
+    解析 Radio 的音频与背景图
+    Returns:
+        (manifest, counts, err) - manifest 为 base64(zlib(JSON))，counts 为 (音频数, 图片数)
+    """
+    token = await get_token() or ""
+    audio, err = await _resolve(audio_path, AUDIO_EXTS, MAX_AUDIO, token)
+    if err: return None, (0, 0), f"音频源: {err}"
+    if not audio: return None, (0, 0), "音频源中没有可播放的文件"
+
+    images, err = await _resolve(image_path, IMAGE_EXTS, MAX_IMAGES, token)
+    if err:
+        # 背景图失败不致命，Runner 会生成纯黑背景
+        logger.warning(f"解析背景图失败: {err}")
+        images = []
+
+    manifest = {"base": f"{base_url}/d", "audio": audio, "images": images}
+    return encode_manifest(manifest), (len(audio), len(images)), None
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import logging
+import os
+import posixpath
+import sqlite3
+import threading
+import time
+from .alist_api import fetch_all_files
+from .executor import run_blocking
+from .storage import data_path
+from .config import INDEX_CRAWL_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# --- Alist 文件索引 ---
+# 后台爬取 Alist 目录树，写入本地 SQLite FTS5 索引，供 /find 毫秒级检索。
+# 增量刷新: 记录每个目录的 modified 与列表哈希，只进入 modified 变化的目录；
+# 部分网盘的父目录 modified 不随深层变化更新，超过 REVISIT_AFTER 未检查的目录也会重新进入。
+# 每轮最多调用 INDEX_CRAWL_BUDGET 次 fs/list。目录列出后立即记录，子树未完成的目录标记 pending，
+# 下一轮直接用已保存的列表继续进入未完成的子目录，不再重复列出。
+
+DB_FILE = data_path("alist_index.db")
+
+CRAWL_CONCURRENCY = 2   # 同时进行的 fs/list 请求数，避免压垮网盘后端
+CRAWL_DELAY = 0.2       # 秒，每个目录之间的间隔
+SEARCH_LIMIT = 10
+MIN_TRIGRAM_QUERY = 3   # trigram 分词要求查询至少 3 个字符，更短时退回 LIKE
+REVISIT_AFTER = 24 * 3600  # 秒，目录超过该时长未检查则即使 modified 未变也重新列出
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    modified TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_parent ON files(parent);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    modified TEXT,
+    listing_hash TEXT NOT NULL,
+    crawled_at REAL NOT NULL,
+    pending INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts(rowid, name, path) VALUES (new.id, new.name, new.path);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, name, path) VALUES ('delete', old.id, old.name, old.path);
+END;
+CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE OF name, path ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, name, path) VALUES ('delete', old.id, old.name, old.path);
+    INSERT INTO files_fts(rowid, name, path) VALUES (new.id, new.name, new.path);
+END;
+"""
+
+def _listing_hash(items):
+    """目录内容指纹: 名称 / 类型 / 大小 / 修改时间"""
+    h = hashlib.sha1()
+    for it in sorted(items, key=lambda x: x.get('name', '')):
+        h.update(f"{it.get('name')}\0{int(bool(it.get('is_dir')))}\0{it.get('size')}\0{it.get('modified')}\n".encode())
+    return h.hexdigest()
+
+class SearchIndex:
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self._conn = None
+        self._lock = threading.Lock()
+        self.crawling = False
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # 旧版索引带有 crawl_id 列 (全量爬取时代的遗留)，索引只是缓存，直接重建
+            columns = [r[1] for r in conn.execute("PRAGMA table_info(files)")]
+            if "crawl_id" in columns:
+                logger.info("📇 索引结构已更新，重建索引")
+                conn.executescript("""
+                    DROP TRIGGER IF EXISTS files_ai;
+                    DROP TRIGGER IF EXISTS files_ad;
+                    DROP TRIGGER IF EXISTS files_au;
+                    DROP TABLE IF EXISTS files_fts;
+                    DROP TABLE IF EXISTS files;
+                    DROP TABLE IF EXISTS dirs;
+                    DROP TABLE IF EXISTS meta;
+                """)
+            # trigram 分词对中文文件名效果更好，旧版 SQLite 不支持时退回 unicode61
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(name, path, content='files', content_rowid='id', tokenize='trigram')")
+            except sqlite3.OperationalError:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(name, path, content='files', content_rowid='id')")
+            conn.executescript(SCHEMA)
+            # 旧版 dirs 表没有 pending 列
+            if "pending" not in [r[1] for r in conn.execute("PRAGMA table_info(dirs)")]:
+                conn.execute("ALTER TABLE dirs ADD COLUMN pending INTEGER NOT NULL DEFAULT 0")
+                conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # --- 同步方法 (在执行器线程中运行) ---
+
+    def _get_meta(self, key, default=None):
+        with self._lock:
+            row = self._db().execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+            return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, str(value)))
+            db.commit()
+
+    def _load_dir_meta(self):
+        """返回 {目录: (modified, listing_hash, crawled_at, pending)}"""
+        with self._lock:
+            rows = self._db().execute("SELECT path, modified, listing_hash, crawled_at, pending FROM dirs").fetchall()
+            return {r[0]: (r[1], r[2], r[3], r[4]) for r in rows}
+
+    def _save_dir_meta(self, path, modified, listing_hash, pending):
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO dirs(path, modified, listing_hash, crawled_at, pending) VALUES (?, ?, ?, ?, ?)",
+                (path, modified, listing_hash, time.time(), int(pending)),
+            )
+            db.commit()
+
+    def _mark_dir_done(self, path):
+        with self._lock:
+            db = self._db()
+            db.execute("UPDATE dirs SET pending=0 WHERE path=?", (path,))
+            db.commit()
+
+    def _child_dirs(self, parent):
+        """已保存的子目录列表 (继续未完成的子树时代替 fs/list)"""
+        with self._lock:
+            rows = self._db().execute("SELECT name, modified FROM files WHERE parent=? AND is_dir=1", (parent,)).fetchall()
+            return [{"name": r[0], "modified": r[1], "is_dir": True} for r in rows]
+
+    def _replace_dir(self, parent, items):
+        """写入一个目录的全部条目，并删除已不存在的条目及其子树"""
+        rows = [(
+            posixpath.join(parent, it['name']), parent, it['name'],
+            1 if it.get('is_dir') else 0, int(it.get('size') or 0), it.get('modified'),
+        ) for it in items]
+        current = {r[0] for r in rows}
+        with self._lock:
+            db = self._db()
+            for path, is_dir in db.execute("SELECT path, is_dir FROM files WHERE parent=?", (parent,)).fetchall():
+                if path in current: continue
+                db.execute("DELETE FROM files WHERE path=?", (path,))
+                if is_dir:
+                    prefix = path + "/"
+                    db.execute("DELETE FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+                    db.execute("DELETE FROM dirs WHERE path=? OR substr(path, 1, ?) = ?", (path, len(prefix), prefix))
+            db.executemany("""
+                INSERT INTO files(path, parent, name, is_dir, size, modified)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    size=excluded.size, modified=excluded.modified,
+                    is_dir=excluded.is_dir
+            """, rows)
+            db.commit()
+
+    def _search(self, query, limit):
+        terms = query.split()
+        if not terms: return []
+        with self._lock:
+            db = self._db()
+            # trigram 无法匹配短于 3 个字符的词，只要有一个短词就整体走 LIKE
+            if all(len(t) >= MIN_TRIGRAM_QUERY for t in terms):
+                # 每个词加引号，避免 FTS 语法字符导致报错
+                fts_query = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+                try:
+                    rows = db.execute("""
+                        SELECT f.path, f.name, f.is_dir, f.size, f.modified
+                        FROM files_fts JOIN files f ON f.id = files_fts.rowid
+                        WHERE files_fts MATCH ?
+                        ORDER BY bm25(files_fts, 10.0, 1.0), f.is_dir DESC
+                        LIMIT ?
+                    """, (fts_query, limit)).fetchall()
+                    return [dict(r) for r in rows]
+                except sqlite3.OperationalError as e:
+                    logger.debug(f"FTS 查询失败，退回 LIKE: {e}")
+            # 与 FTS 一致: 每个词都需出现在路径中 (路径包含文件名)
+            likes = ["%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%" for t in terms]
+            where = " AND ".join(["path LIKE ? ESCAPE '\\'"] * len(likes))
+            rows = db.execute(f"""
+                SELECT path, name, is_dir, size, modified FROM files
+                WHERE {where}
+                ORDER BY is_dir DESC, length(name)
+                LIMIT ?
+            """, (*likes, limit)).fetchall()
+            return [dict(r) for r in rows]
+
+    def _count(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    # --- 异步接口 ---
+
+    async def search(self, query, limit=SEARCH_LIMIT):
+        return await run_blocking(self._search, query, limit)
+
+    async def stats(self):
+        count = await run_blocking(self._count)
+        last = await run_blocking(self._get_meta, "last_crawl_end")
+        return count, float(last) if last else None
+
+    async def crawl(self, root="/", budget=INDEX_CRAWL_BUDGET):
+        """
+        增量爬取目录树
+        Returns:
+            {"listed": fs/list 调用数, "changed": 内容变化的目录数, "errors": 错误数, "complete": 是否已全部同步}
+        """
+        if self.crawling: return None
+        self.crawling = True
+        try:
+            known = await run_blocking(self._load_dir_meta)
+            sem = asyncio.Semaphore(CRAWL_CONCURRENCY)
+            counters = {"listed": 0, "changed": 0, "errors": 0}
+
+            async def visit(path, modified):
+                """返回该子树是否已在本轮全部同步"""
+                old = known.get(path)
+                revisit_before = time.time() - REVISIT_AFTER
+                if old and old[3] and old[0] == modified and old[2] >= revisit_before:
+                    # 上一轮已列出但子树未完成: 沿用保存的列表，不占用预算
+                    items = await run_blocking(self._child_dirs, path)
+                else:
+                    if counters["listed"] >= budget: return False
+                    counters["listed"] += 1
+                    async with sem:
+                        items, err = await fetch_all_files(path)
+                        await asyncio.sleep(CRAWL_DELAY)
+                    if err:
+                        counters["errors"] += 1
+                        logger.debug(f"索引目录失败 {path}: {err}")
+                        return False
+
+                    listing_hash = _listing_hash(items)
+                    if not old or old[1] != listing_hash:
+                        await run_blocking(self._replace_dir, path, items)
+                        counters["changed"] += 1
+                    # 列出后立即记录，子树完成前保持 pending
+                    await run_blocking(self._save_dir_meta, path, modified, listing_hash, True)
+
+                # 只进入 modified 变化、从未同步过、子树未完成或长时间未检查的子目录
+                # (最后一种用于发现父目录 modified 未更新时的深层删除 / 新增)
+                targets = []
+                for it in items:
+                    if not it.get('is_dir'): continue
+                    child = posixpath.join(path, it['name'])
+                    child_old = known.get(child)
+                    if (not child_old or child_old[0] != it.get('modified') or not it.get('modified')
+                            or child_old[3] or child_old[2] < revisit_before):
+                        targets.append(visit(child, it.get('modified')))
+                results = await asyncio.gather(*targets) if targets else []
+
+                complete = all(results)
+                if complete:
+                    await run_blocking(self._mark_dir_done, path)
+                return complete
+
+            complete = await visit(root, None)
+            await run_blocking(self._set_meta, "last_crawl_end", time.time())
+            logger.info(f"📇 索引刷新: 请求 {counters['listed']} 次, 变化目录 {counters['changed']} 个, 错误 {counters['errors']} 个, {'已同步' if complete else '未完成，下轮继续'}")
+            return dict(counters, complete=complete)
+        finally:
+            self.crawling = False
+
+search_index = SearchIndex()
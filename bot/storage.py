@@ -0,0 +1,47 @@
+import json
+import os
+import logging
+import tempfile
+from .config import HOME_DIR
+
+# 使用隐藏目录，确保不受项目文件夹名称变更影响
+DATA_DIR = os.path.join(HOME_DIR, ".alist-bot-data")
+
+logger = logging.getLogger(__name__)
+
+def data_path(name):
+    """返回数据目录下的文件路径"""
+    return os.path.join(DATA_DIR, name)
+
+def atomic_write_json(path, data):
+    """原子保存: 写临时文件 -> fsync -> rename，崩溃时旧文件保持完整"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno()) # 强制写入磁盘
+        os.replace(tmp_path, path)
+    except Exception:
+        try: os.unlink(tmp_path)
+        except OSError: pass
+        raise
+    # 同步目录项，确保 rename 落盘
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try: os.fsync(dir_fd)
+        finally: os.close(dir_fd)
+    except OSError: pass
+
+def read_json(path, default=None):
+    """读取 JSON 文件，不存在或损坏时返回 default"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except Exception as e:
+        logger.warning(f"读取 {os.path.basename(path)} 失败: {e}")
+        return default
@@ -1,62 +1,76 @@
 import json
 import os
 import logging
-from .config import HOME_DIR
+import threading
+from .storage import data_path, atomic_write_json
 
-# 使用隐藏目录，确保不受项目文件夹名称变更影响
-DATA_DIR = os.path.join(HOME_DIR, ".alist-bot-data")
-DATA_FILE = os.path.join(DATA_DIR, "stream_keys.json")
+DATA_FILE = data_path("stream_keys.json")
 
 logger = logging.getLogger(__name__)
 
+# --- 内存缓存 ---
+# 以文件 mtime/size 作为失效依据，未变化时直接返回内存中的数据
+_lock = threading.RLock()
+_cache = None
+_cache_sig = None
+
+def _file_sig():
+    try:
+        st = os.stat(DATA_FILE)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
 def _load_data():
-    """加载数据，如果文件不存在或损坏则返回空字典"""
-    if not os.path.exists(DATA_DIR):
+    """加载数据 (带缓存)，如果文件不存在或损坏则返回空字典"""
+    global _cache, _cache_sig
+    with _lock:
+        sig = _file_sig()
+        if _cache is not None and sig == _cache_sig:
+            return _cache
+
+        if sig is None:
+            _cache, _cache_sig = {}, None
+            return _cache
+
         try:
-            os.makedirs(DATA_DIR, exist_ok=True)
+            with open(DATA_FILE, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            data = json.loads(content) if content else {}
+            if not isinstance(data, dict): raise ValueError("顶层不是对象")
+        except ValueError:
+            logger.error("配置文件 JSON 格式错误，已重置为空。")
+            # 备份损坏的文件
+            try:
+                os.replace(DATA_FILE, DATA_FILE + ".bak")
+            except Exception: pass
+            data, sig = {}, None
         except Exception as e:
-            logger.error(f"创建数据目录失败: {e}")
+            logger.error(f"读取密钥文件失败: {e}")
             return {}
-    
-    if not os.path.exists(DATA_FILE):
-        return {}
-    
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            if not content: return {}
-            return json.load(f)
-    except json.JSONDecodeError:
-        logger.error("配置文件 JSON 格式错误，已重置为空。")
-        # 备份损坏的文件
-        try:
-            os.rename(DATA_FILE, DATA_FILE + ".bak")
-        except: pass
-        return {}
-    except Exception as e:
-        logger.error(f"读取密钥文件失败: {e}")
-        return {}
+
+        _cache, _cache_sig = data, sig
+        return _cache
 
 def _save_data(data):
-    """保存数据"""
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR, exist_ok=True)
-    try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            f.flush()
-            os.fsync(f.fileno()) # 强制写入磁盘
-        return True
-    except Exception as e:
-        logger.error(f"写入密钥文件失败: {e}")
-        return False
+    """原子保存: 写临时文件 -> fsync -> rename，崩溃时旧文件保持完整"""
+    global _cache, _cache_sig
+    with _lock:
+        try:
+            atomic_write_json(DATA_FILE, data)
+            _cache, _cache_sig = data, _file_sig()
+            return True
+        except Exception as e:
+            logger.error(f"写入密钥文件失败: {e}")
+            return False
 
 def add_key(name, url):
     """添加或更新密钥"""
     try:
-        data = _load_data()
-        data[name] = url.strip()
-        return _save_data(data)
+        with _lock:
+            data = dict(_load_data())
+            data[name] = url.strip()
+            return _save_data(data)
     except Exception as e:
         logger.error(f"添加密钥逻辑错误: {e}")
         return False
@@ -64,12 +78,12 @@ def add_key(name, url):
 def delete_key(name):
     """删除密钥"""
     try:
-        data = _load_data()
-        if name in data:
-            del data[name]
-            _save_data(data)
-            return True
-        return False
+        with _lock:
+            data = dict(_load_data())
+            if name in data:
+                del data[name]
+                return _save_data(data)
+            return False
     except Exception:
         return False
 
@@ -79,8 +93,8 @@ def get_key(name):
     return data.get(name)
 
 def get_all_keys():
-    """获取所有密钥"""
-    return _load_data()
+    """获取所有密钥 (返回副本，避免调用方修改缓存)"""
+    return dict(_load_data())
 
 def get_default_key():
     """获取第一个密钥作为默认值"""
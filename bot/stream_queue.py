@@ -0,0 +1,46 @@
+import logging
+import posixpath
+from .alist_api import fetch_all_files
+from .radio_playlist import encode_manifest
+from .url_resolver import url_resolver
+
+logger = logging.getLogger(__name__)
+
+# --- 视频队列 ---
+# 在浏览器中选择多个文件或整个目录，一次派发只启动一个 Runner，
+# Runner 逐个转码后接入同一路推流，整个队列期间 RTMP 连接保持不断。
+
+VIDEO_EXTS = ('.mp4', '.mkv', '.mov', '.avi', '.flv', '.ts', '.webm', '.m4v')
+
+MAX_QUEUE = 100         # 单次队列最多条目数
+
+def is_video(name):
+    return name.lower().endswith(VIDEO_EXTS)
+
+async def list_folder_videos(path):
+    """
+    目录中的视频文件 (按文件名排序)
+    Returns:
+        (paths, err)
+    """
+    items, err = await fetch_all_files(path)
+    if err: return [], err
+    names = sorted(it['name'] for it in items if not it.get('is_dir') and is_video(it['name']))
+    return [posixpath.join(path, n) for n in names], None
+
+async def build_queue_manifest(paths, base_url):
+    """
+    并发解析每个文件的地址并生成清单
+    Returns:
+        (manifest, resolved, err) - manifest 为 base64(zlib(JSON))，resolved 为成功解析的路径
+    """
+    paths = paths[:MAX_QUEUE]
+    # 队列可能连续播放数小时，网盘直链 (10-60 分钟有效) 轮到时多半已过期，
+    # 统一走隧道 /d 链接，由 Alist 在每个条目开始播放时再签发上游地址
+    urls = await url_resolver.resolve_many(paths, base_url, tunnel=True)
+    resolved = [p for p in paths if p in urls]
+    for p in paths:
+        if p not in urls: logger.warning(f"队列条目读取失败，已跳过: {p}")
+    if not resolved: return None, [], "队列中没有可读取的文件"
+    manifest = encode_manifest({"base": "", "videos": [urls[p][0] for p in resolved]})
+    return manifest, resolved, None
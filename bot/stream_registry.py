@@ -0,0 +1,230 @@
+import asyncio
+import copy
+import logging
+import time
+from datetime import datetime
+import httpx
+from .config import GITHUB_POOL
+from .github_pool import scheduler, RUN_TIMEOUT
+from .storage import data_path, atomic_write_json, read_json
+from .executor import run_blocking
+from . import github_api
+
+logger = logging.getLogger(__name__)
+
+# --- 推流任务登记 ---
+# 派发成功后登记推流，按账号批量轮询 Actions runs API (ETag 条件请求)，
+# 把每次派发匹配到具体的 Workflow Run，支持查看剩余时长与取消。
+
+STATE_FILE = data_path("streams.json")
+
+MATCH_WINDOW = 120     # 秒，Run 创建时间允许早于派发时间的误差
+RUNS_PER_PAGE = 30
+KEEP_FINISHED = 20     # 保留的已结束记录数量
+SAVE_DELAY = 2         # 秒，记录写盘的合并间隔
+
+def _parse_time(value):
+    if not value: return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def _token_for(repo):
+    for acc in GITHUB_POOL:
+        if acc["repo"] == repo: return acc["token"]
+    return None
+
+class StreamRegistry:
+    def __init__(self, state_file=STATE_FILE):
+        self.state_file = state_file
+        self.streams = []   # 记录列表 (按登记顺序)
+        self._etags = {}    # repo -> (etag, 上次的 workflow_runs)
+        self._next_id = 1
+        self._lock = asyncio.Lock()
+        self._save_task = None
+        self._load()
+
+    def _load(self):
+        data = read_json(self.state_file, {})
+        if isinstance(data, dict):
+            self.streams = data.get("streams", [])
+            self._next_id = data.get("next_id", len(self.streams) + 1)
+
+    def _write(self, snapshot):
+        try:
+            atomic_write_json(self.state_file, snapshot)
+        except Exception as e:
+            logger.warning(f"保存推流记录失败: {e}")
+
+    def _snapshot(self):
+        return {"streams": copy.deepcopy(self.streams), "next_id": self._next_id}
+
+    def _save(self):
+        """合并短时间内的多次修改，在执行器线程中写盘"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._snapshot())  # 无事件循环 (脚本调用) 时直接写
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(SAVE_DELAY)
+        await self.flush()
+
+    async def flush(self):
+        """立即写盘 (退出时调用)"""
+        try:
+            await run_blocking(self._write, self._snapshot())
+        except Exception as e:
+            logger.warning(f"保存推流记录失败: {e}")
+
+    def register(self, repo, dispatch_id, label, extra=None):
+        """登记一次成功的派发，返回本地推流编号"""
+        record = {
+            "id": self._next_id,
+            "repo": repo,
+            "dispatch_id": dispatch_id,
+            "run_id": None,
+            "label": label,
+            "dispatched_at": time.time(),
+            "started_at": None,
+            "status": "dispatched",
+            "conclusion": None,
+            "html_url": None,
+        }
+        if extra: record.update(extra)
+        self._next_id += 1
+        self.streams.append(record)
+        self._trim()
+        self._save()
+        return record["id"]
+
+    def _trim(self):
+        finished = [s for s in self.streams if s["status"] == "completed"]
+        if len(finished) > KEEP_FINISHED:
+            drop = {id(s) for s in finished[:len(finished) - KEEP_FINISHED]}
+            self.streams = [s for s in self.streams if id(s) not in drop]
+
+    def active(self):
+        return [s for s in self.streams if s["status"] != "completed"]
+
+    def get(self, stream_id):
+        for s in self.streams:
+            if s["id"] == stream_id: return s
+        return None
+
+    def remaining_seconds(self, record):
+        start = record.get("started_at") or record["dispatched_at"]
+        return max(0, RUN_TIMEOUT - (time.time() - start))
+
+    async def _fetch_runs(self, repo, token):
+        """拉取该仓库最近的 repository_dispatch runs，304 时复用上次结果"""
+        etag, cached = self._etags.get(repo, (None, None))
+        headers = {"If-None-Match": etag} if etag else None
+        r = await github_api.request(
+            "GET", f"/repos/{repo}/actions/runs", token,
+            params={"event": "repository_dispatch", "per_page": RUNS_PER_PAGE},
+            headers=headers,
+        )
+        scheduler.update_rate_limit({"repo": repo}, r.headers)
+        if r.status_code == 304 and cached is not None:
+            return cached
+        if r.status_code != 200:
+            raise RuntimeError(f"{repo} runs API 返回 {r.status_code}")
+        runs = r.json().get("workflow_runs", [])
+        self._etags[repo] = (r.headers.get("ETag"), runs)
+        return runs
+
+    def _apply_runs(self, repo, runs):
+        """返回是否有记录发生变化"""
+        records = [s for s in self.active() if s["repo"] == repo]
+        before = copy.deepcopy(records)
+        by_run = {s["run_id"]: s for s in records if s["run_id"]}
+        claimed = {s["run_id"] for s in self.streams if s["run_id"]}
+
+        # 未匹配的派发按时间顺序认领最早的未被认领 Run
+        pending = sorted((s for s in records if not s["run_id"]), key=lambda s: s["dispatched_at"])
+        candidates = sorted(
+            (run for run in runs if run["id"] not in claimed),
+            key=lambda run: _parse_time(run.get("created_at")) or 0,
+        )
+        for record in pending:
+            for run in candidates:
+                created = _parse_time(run.get("created_at")) or 0
+                if created >= record["dispatched_at"] - MATCH_WINDOW:
+                    record["run_id"] = run["id"]
+                    by_run[run["id"]] = record
+                    candidates.remove(run)
+                    scheduler.rename_run(repo, record["dispatch_id"], run["id"])
+                    break
+
+        for run in runs:
+            record = by_run.get(run["id"])
+            if not record: continue
+            record["status"] = run.get("status") or record["status"]
+            record["conclusion"] = run.get("conclusion")
+            record["html_url"] = run.get("html_url")
+            record["started_at"] = _parse_time(run.get("run_started_at")) or record["started_at"]
+            if record["status"] == "completed":
+                scheduler.release(repo, record["run_id"])
+
+        # 超过最长运行时间仍未看到结束状态的，视为已结束
+        for record in records:
+            if record["status"] != "completed" and self.remaining_seconds(record) <= 0:
+                record["status"] = "completed"
+                record["conclusion"] = record["conclusion"] or "timed_out"
+                scheduler.release(repo, record["run_id"] or record["dispatch_id"])
+        return records != before
+
+    async def poll(self):
+        """每个账号一次请求，批量刷新所有进行中的推流状态"""
+        async with self._lock:
+            repos = {s["repo"] for s in self.active()}
+            if not repos: return
+            changed = False
+            for repo in repos:
+                token = _token_for(repo)
+                if not token: continue
+                try:
+                    runs = await self._fetch_runs(repo, token)
+                except Exception as e:
+                    logger.warning(f"查询 {repo} Workflow 状态失败: {e}")
+                    continue
+                if self._apply_runs(repo, runs): changed = True
+            if changed:
+                self._trim()
+                self._save()
+
+    async def cancel(self, stream_id):
+        """
+        取消推流
+        Returns:
+            (success, msg)
+        """
+        record = self.get(stream_id)
+        if not record or record["status"] == "completed":
+            return False, "找不到进行中的推流"
+        if not record["run_id"]:
+            await self.poll()
+            if not record["run_id"]:
+                return False, "Workflow 尚未启动，请稍后再试"
+        token = _token_for(record["repo"])
+        if not token:
+            return False, "账号已从配置中移除"
+        try:
+            r = await github_api.request("POST", f"/repos/{record['repo']}/actions/runs/{record['run_id']}/cancel", token)
+        except httpx.HTTPError as e:
+            logger.warning(f"取消推流 {stream_id} 失败: {e}")
+            return False, f"网络请求失败: {e}"
+        if r.status_code in (202, 204):
+            record["status"] = "completed"
+            record["conclusion"] = "cancelled"
+            scheduler.release(record["repo"], record["run_id"])
+            self._save()
+            return True, "已发送取消指令"
+        return False, f"GitHub 返回 {r.status_code}"
+
+registry = StreamRegistry()
@@ -1,13 +1,15 @@
 
 import os
+import asyncio
 import subprocess
 import psutil
 import re
-import requests
-import json
 import logging
 import socket
-from .config import HOME_DIR, ARIA2_RPC_SECRET, get_account_count
+import time
+import threading
+from .config import HOME_DIR, get_account_count
+from . import aria2_api
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +24,75 @@ def check_port(port):
     except:
         return False
 
+# --- 进程索引 ---
+# 端口探测失败时的兜底检测。只在刷新时处理新增 / 消失的 PID，
+# 查询某服务是否存在为 O(1)。
+
+PROCESS_KEYWORDS = ("alist", "aria2c", "cloudflared")
+PROCESS_INDEX_MIN_INTERVAL = 5  # 秒，两次刷新的最小间隔
+
+class ProcessIndex:
+    def __init__(self):
+        self._known = set()                               # 已完成识别的 PID
+        self._matched = {}                                # pid -> (服务名集合, create_time)
+        self._by_service = {k: set() for k in PROCESS_KEYWORDS}
+        self._last_refresh = 0
+        self._lock = threading.Lock()  # 可能在执行器的多个线程中被调用
+
+    def _forget(self, pid):
+        self._known.discard(pid)
+        hit = self._matched.pop(pid, None)
+        if hit:
+            for key in hit[0]: self._by_service[key].discard(pid)
+
+    def refresh(self, force=False):
+        """增量刷新: 只检查新 PID，清理已退出的 PID"""
+        with self._lock:
+            self._refresh(force)
+
+    def _refresh(self, force):
+        now = time.monotonic()
+        if not force and now - self._last_refresh < PROCESS_INDEX_MIN_INTERVAL:
+            return
+        self._last_refresh = now
+
+        current = set(psutil.pids())
+        for pid in self._known - current:
+            self._forget(pid)
+
+        # PID 复用检测: 已匹配的进程 create_time 变化则重新识别
+        for pid, (_, ctime) in list(self._matched.items()):
+            try:
+                if psutil.Process(pid).create_time() != ctime: self._forget(pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self._forget(pid)
+
+        for pid in current - self._known:
+            try:
+                proc = psutil.Process(pid)
+                name = proc.name() or ""
+                ctime = proc.create_time()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            except psutil.AccessDenied:
+                continue  # 未能识别，下次刷新再试
+            # 先按进程名匹配 (与原逻辑一致)，cmdline 读不到时不影响结果
+            try:
+                cmdline = " ".join(proc.cmdline() or [])
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                cmdline = ""
+            # 同一进程可同时计入多个服务 (如包含多个服务名的启动脚本)
+            keys = {key for key in PROCESS_KEYWORDS if key in name or key in cmdline}
+            self._known.add(pid)
+            if keys:
+                self._matched[pid] = (keys, ctime)
+                for key in keys: self._by_service[key].add(pid)
+
+    def has(self, service):
+        return bool(self._by_service.get(service))
+
+process_index = ProcessIndex()
+
 def check_services_health():
     # Termux 中 psutil 经常拿不到进程列表，改为检测端口
     # Alist: 5244
@@ -33,44 +104,17 @@ def check_services_health():
         'cloudflared': check_port(49500)
     }
     
-    # 如果端口没通，尝试兜底用进程名查一次 (兼容部分特殊情况)
+    # 如果端口没通，查进程索引兜底 (兼容部分特殊情况)
     if not all(status.values()):
         try:
-            for proc in psutil.process_iter(['name', 'cmdline']):
-                try:
-                    name = proc.info['name'] or ""
-                    cmdline = " ".join(proc.info['cmdline'] or [])
-                    if not status['alist'] and ('alist' in name or 'alist' in cmdline): status['alist'] = True
-                    if not status['aria2c'] and ('aria2c' in name or 'aria2c' in cmdline): status['aria2c'] = True
-                    if not status['cloudflared'] and ('cloudflared' in name or 'cloudflared' in cmdline): status['cloudflared'] = True
-                except (psutil.NoSuchProcess, psutil.AccessDenied): continue
+            process_index.refresh()
+            for name in status:
+                if not status[name]: status[name] = process_index.has(name)
         except Exception: 
             pass # 忽略 psutil 错误
             
     return status
 
-def get_public_url():
-    """仅从日志中获取 Cloudflare Quick Tunnel 链接"""
-    log_files = ["tunnel-error.log", "tunnel-out.log"]
-    
-    for log_file in log_files:
-        try:
-            log_path = os.path.join(HOME_DIR, ".pm2", "logs", log_file)
-            if os.path.exists(log_path):
-                # 读取最后 8KB 内容，防止文件过大
-                with open(log_path, 'rb') as f:
-                    try:
-                        f.seek(-8192, 2)
-                    except OSError:
-                        f.seek(0)
-                    logs = f.read().decode('utf-8', errors='ignore')
-                    
-                # 匹配 trycloudflare.com 链接
-                urls = re.findall(r'https://[a-zA-Z0-9-]+\.trycloudflare\.com', logs)
-                if urls: return urls[-1]
-        except Exception: pass
-    return None
-
 def get_disk_usage():
     """获取磁盘使用情况"""
     try:
@@ -83,7 +127,8 @@ def get_disk_usage():
     except Exception:
         return "未知", 0
 
-def get_system_stats():
+def get_system_stats(pool_summary=(0, 0)):
+    """pool_summary 为 scheduler.summary() 的结果，需在事件循环中取得后传入 (本函数在执行器线程运行)"""
     msg = "*📊 系统状态:*"
     health = check_services_health()
     msg += f"\n{'✅' if health['alist'] else '❌'} `alist`"
@@ -106,7 +151,8 @@ def get_system_stats():
     # 新增: GitHub 账号池状态显示
     gh_count = get_account_count()
     if gh_count > 0:
-        msg += f"\n☁️ GitHub Pool: `{gh_count}` (就绪)"
+        available, running = pool_summary
+        msg += f"\n☁️ GitHub Pool: `{available}/{gh_count}` 可用 | 推流中 `{running}`"
     else:
         msg += "\n⚠️ GitHub: `未配置` (无法推流)"
     
@@ -119,16 +165,21 @@ def get_log_file_path(service="alist"):
     """返回日志文件的绝对路径"""
     return os.path.join(HOME_DIR, ".pm2", "logs", f"{service}-out.log")
 
-def restart_pm2_services():
+async def restart_pm2_services():
+    """异步执行 pm2 restart all，不占用事件循环"""
     try:
-        subprocess.run(["pm2", "restart", "all"], check=True)
+        proc = await asyncio.create_subprocess_exec(
+            "pm2", "restart", "all",
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await asyncio.wait_for(proc.communicate(), 60)
+        if proc.returncode != 0:
+            return False, f"❌ 失败: {stderr.decode('utf-8', errors='ignore').strip()[:200]}"
         return True, "✅ 服务已重启。如果遇到 Error 530，这通常能解决问题。"
     except Exception as e: return False, f"❌ 失败: {str(e)}"
 
-def get_admin_pass():
-    """获取 Alist 密码，优先读取文件，失败则尝试解析命令行输出"""
-    
-    # 策略 1: 读取 set_pass.sh 生成的密码文件 (最可靠)
+def read_admin_pass_file():
+    """读取 set_pass.sh 生成的密码文件，不存在时返回 None (不启动子进程)"""
     pass_file = os.path.join(HOME_DIR, ".alist_pass")
     if os.path.exists(pass_file):
         try:
@@ -136,6 +187,14 @@ def get_admin_pass():
                 content = f.read().strip()
                 if content: return content
         except Exception: pass
+    return None
+
+def get_admin_pass():
+    """获取 Alist 密码，优先读取文件，失败则尝试解析命令行输出"""
+    
+    # 策略 1: 读取 set_pass.sh 生成的密码文件 (最可靠)
+    content = read_admin_pass_file()
+    if content: return content
 
     # 策略 2: 运行 alist admin 解析输出 (兜底)
     try:
@@ -158,6 +217,11 @@ def get_admin_pass():
 
 # --- Aria2 相关 ---
 
+def escape_text(text):
+    """转义 Markdown V1 特殊字符"""
+    if not text: return ""
+    return str(text).replace("_", "\\_").replace("*", "\\*").replace("`", "\\`").replace("[", "\\[")
+
 def format_bytes(size):
     power = 2**10
     n = 0
@@ -167,62 +231,62 @@ def format_bytes(size):
         n += 1
     return f"{round(size, 2)} {power_labels[n]}B"
 
-def get_aria2_status():
-    rpc_url = "http://127.0.0.1:6800/jsonrpc"
-    # 获取全局统计
-    payload_global = {"jsonrpc": "2.0", "method": "aria2.getGlobalStat", "id": "stat"}
-    # 获取活跃任务
-    payload_active = {"jsonrpc": "2.0", "method": "aria2.tellActive", "id": "list", "params": [["gid", "status", "totalLength", "completedLength", "downloadSpeed", "files"]]}
-    
-    if ARIA2_RPC_SECRET:
-        token_param = f"token:{ARIA2_RPC_SECRET}"
-        payload_global.setdefault("params", []).insert(0, token_param)
-        payload_active["params"].insert(0, token_param)
+def _format_task(t):
+    """格式化单个任务行"""
+    try:
+        total = int(t.get('totalLength', 0))
+        done = int(t.get('completedLength', 0))
+        speed = int(t.get('downloadSpeed', 0))
+        percent = round((done/total)*100, 1) if total > 0 else 0
+
+        # 获取文件名
+        files = t.get('files') or [{}]
+        file_path = files[0].get('path')
+        file_name = os.path.basename(file_path) if file_path else "未知文件"
+
+        line = f"📄 `{file_name}`\n"
+        if t.get('status') == 'active':
+            line += f"└ {percent}% ({format_bytes(speed)}/s)\n"
+        elif t.get('status') == 'error':
+            line += f"└ ❌ {escape_text(t.get('errorMessage')) or '下载出错'}\n"
+        else:
+            line += f"└ {percent}% ({t.get('status')})\n"
+        return line
+    except Exception:
+        return "📄 解析任务详情失败\n"
 
+async def get_aria2_status():
+    """Aria2 状态视图 (单次 system.multicall 获取全部数据)"""
     try:
-        # 查询全局
-        r_g = requests.post(rpc_url, json=payload_global, timeout=3).json()
-        g_stat = r_g.get("result", {})
+        overview = await aria2_api.get_overview()
+        g_stat = overview["global"]
         speed_down = format_bytes(int(g_stat.get("downloadSpeed", 0)))
         speed_up = format_bytes(int(g_stat.get("uploadSpeed", 0)))
-        
-        # 查询任务
-        r_a = requests.post(rpc_url, json=payload_active, timeout=3).json()
-        tasks = r_a.get("result", [])
-        
+
         msg = f"📉 *Aria2 概览*\n⬇️ {speed_down}/s  ⬆️ {speed_up}/s\n"
         msg += f"活动: {g_stat.get('numActive')}  等待: {g_stat.get('numWaiting')}  停止: {g_stat.get('numStopped')}\n\n"
-        
-        if not tasks:
-            msg += "💤 当前没有正在下载的任务"
+
+        active, waiting, stopped = overview["active"], overview["waiting"], overview["stopped"]
+        if not active:
+            msg += "💤 当前没有正在下载的任务\n"
         else:
-            for t in tasks:
-                try:
-                    total = int(t['totalLength'])
-                    done = int(t['completedLength'])
-                    speed = int(t['downloadSpeed'])
-                    percent = round((done/total)*100, 1) if total > 0 else 0
-                    
-                    # 获取文件名
-                    file_path = t['files'][0]['path']
-                    file_name = os.path.basename(file_path) if file_path else "未知文件"
-                    
-                    msg += f"📄 `{file_name}`\n"
-                    msg += f"└ {percent}% ({format_bytes(speed)}/s)\n"
-                except:
-                    msg += "📄 解析任务详情失败\n"
-                    
+            for t in active: msg += _format_task(t)
+
+        if waiting:
+            msg += "\n⏳ *等待中*\n"
+            for t in waiting: msg += _format_task(t)
+
+        if stopped:
+            msg += "\n⏹ *最近结束*\n"
+            for t in stopped: msg += _format_task(t)
+
         return msg
     except Exception as e:
         return f"❌ 无法连接 Aria2 RPC: {str(e)}"
 
-def add_aria2_task(url):
-    rpc_url = "http://127.0.0.1:6800/jsonrpc"
-    payload = {"jsonrpc": "2.0", "method": "aria2.addUri", "id": "bot", "params": [[url]]}
-    if ARIA2_RPC_SECRET: payload["params"].insert(0, f"token:{ARIA2_RPC_SECRET}")
+async def add_aria2_task(url, options=None):
     try:
-        r = requests.post(rpc_url, json=payload, timeout=5)
-        res = r.json()
-        if "error" in res: return False, f"Aria2 报错: {res['error']['message']}"
-        return True, f"✅ 任务已添加 GID: `{res.get('result')}`"
+        gid = await aria2_api.add_uri(url, options)
+        return True, f"✅ 任务已添加 GID: `{gid}`"
+    except aria2_api.Aria2Error as e: return False, f"Aria2 报错: {e}"
     except Exception as e: return False, f"❌ 无法连接 Aria2: {str(e)}"
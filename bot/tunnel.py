@@ -0,0 +1,105 @@
+import os
+import re
+import logging
+import httpx
+from .config import HOME_DIR
+
+logger = logging.getLogger(__name__)
+
+# --- Quick Tunnel 地址跟踪 ---
+# 按字节偏移持续跟读 pm2 日志，只解析新增内容；处理日志轮转 / 截断。
+# 首次读取 (或轮转后) 只读末尾 INITIAL_TAIL，更早的地址由 metrics 端口兜底。
+# cloudflared 的 metrics 端口 (/quicktunnel) 作为权威来源用于校验。
+
+LOG_FILES = ["tunnel-error.log", "tunnel-out.log"]
+METRICS_URL = "http://127.0.0.1:49500/quicktunnel"
+URL_PATTERN = re.compile(rb'https://[a-zA-Z0-9-]+\.trycloudflare\.com')
+READ_CHUNK = 64 * 1024
+INITIAL_TAIL = 256 * 1024  # 首次跟读时只读取的日志末尾字节数 (poll 在事件循环上同步执行)
+
+class TunnelUrlTracker:
+    def __init__(self, log_dir=None):
+        self.log_dir = log_dir or os.path.join(HOME_DIR, ".pm2", "logs")
+        self._offsets = {}  # 文件名 -> (inode, 已读偏移)
+        self._tails = {}    # 文件名 -> 上次读取未完成的半行
+        self._url = None
+        self._url_mtime = 0  # 最新 URL 所在日志的修改时间，用于多个日志间取最新
+
+    def _follow(self, log_file):
+        path = os.path.join(self.log_dir, log_file)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        inode, offset = self._offsets.get(log_file, (None, 0))
+        # 首次读取、轮转 (inode 变化) 或截断 (文件变小) 时从末尾 INITIAL_TAIL 处开始
+        skip_partial = False
+        if inode != st.st_ino or st.st_size < offset:
+            offset = max(0, st.st_size - INITIAL_TAIL)
+            skip_partial = offset > 0
+            self._tails.pop(log_file, None)
+        if st.st_size == offset:
+            self._offsets[log_file] = (st.st_ino, offset)
+            return
+
+        found = None
+        tail = self._tails.get(log_file, b"")
+        with open(path, "rb") as f:
+            f.seek(offset)
+            if skip_partial: f.readline()  # 丢弃被截断的第一行
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk: break
+                data = tail + chunk
+                # 保留最后一个不完整的行，避免 URL 被切断
+                cut = data.rfind(b"\n") + 1
+                complete, tail = data[:cut], data[cut:]
+                urls = URL_PATTERN.findall(complete)
+                if urls: found = urls[-1]
+            offset = f.tell()
+
+        self._offsets[log_file] = (st.st_ino, offset)
+        self._tails[log_file] = tail[-4096:]
+        if found and st.st_mtime >= self._url_mtime:
+            self._url = found.decode()
+            self._url_mtime = st.st_mtime
+
+    def poll(self):
+        """读取日志新增部分并返回最新 URL"""
+        for log_file in LOG_FILES:
+            try:
+                self._follow(log_file)
+            except Exception as e:
+                logger.debug(f"读取隧道日志失败 {log_file}: {e}")
+        return self._url
+
+    @property
+    def url(self):
+        return self._url
+
+    async def verify(self):
+        """
+        通过 cloudflared metrics 校验当前地址
+        Returns:
+            校验后的 URL，metrics 不可用时返回日志中的 URL
+        """
+        try:
+            async with httpx.AsyncClient(timeout=3) as client:
+                r = await client.get(METRICS_URL)
+            hostname = (r.json() or {}).get("hostname")
+            if hostname:
+                url = f"https://{hostname}"
+                if url != self._url:
+                    logger.info(f"隧道地址已更新: {url}")
+                self._url = url
+        except Exception as e:
+            logger.debug(f"cloudflared metrics 不可用: {e}")
+        return self._url
+
+tunnel_tracker = TunnelUrlTracker()
+
+async def resolve_public_url():
+    """优先使用内存中的地址，缺失时再向 metrics 端口查询"""
+    url = tunnel_tracker.poll()
+    if url: return url
+    return await tunnel_tracker.verify()
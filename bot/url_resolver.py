@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import quote, urlparse, parse_qs
+from .alist_api import ALIST_API_URL, get_file_info, get_token
+
+logger = logging.getLogger(__name__)
+
+# --- 直链解析缓存 ---
+# 以 Alist 路径为键缓存 fs/get 的 raw_url / sign / 驱动名，按驱动的直链有效期过期，
+# 同一路径的并发解析只发一次请求，并记录每次推流走的是网盘直链还是隧道 /d 链接。
+
+# 各驱动直链的大致有效期 (秒)，直链本身带过期参数时以参数为准
+DRIVER_LINK_TTL = {
+    "Local": 6 * 3600,
+    "AliyundriveOpen": 900,
+    "Aliyundrive": 900,
+    "115 Cloud": 600,
+    "123Pan": 600,
+    "BaiduNetdisk": 3600,
+    "Quark": 3600,
+    "OneDrive": 3600,
+    "GoogleDrive": 3600,
+    "PikPak": 3600,
+}
+DEFAULT_LINK_TTL = 600
+EXPIRY_MARGIN = 60          # 秒，提前过期，避免交给 Runner 时恰好失效
+RUNNER_MIN_TTL = 600        # 秒，交给 Runner 的直链至少还需有效的时长 (Runner 启动 + 安装 ffmpeg 需数分钟)
+CACHE_MAX_ENTRIES = 512
+RESOLVE_CONCURRENCY = 4     # 批量解析时同时进行的 fs/get 请求数
+
+# 直链中常见的过期时间参数 (Unix 时间戳)
+EXPIRY_PARAMS = ("x-oss-expires", "expires", "Expires", "x-expires", "e")
+
+LOCAL_HOST_RE = re.compile(r'://(127\.|10\.|172\.(1[6-9]|2\d|3[0-1])\.|192\.168\.|localhost)')
+
+def signed_path(path, sign, token):
+    """相对 /d 的签名路径: 优先 Alist 的 sign，未开启签名时退回 token"""
+    url = quote(path)
+    if sign: return f"{url}?sign={sign}"
+    if token: return f"{url}?token={token}"
+    return url
+
+def _normalize(path):
+    return path if path.startswith("/") else "/" + path
+
+def _url_expiry(url):
+    """从直链参数中读取过期时间戳，没有时返回 None"""
+    try:
+        query = parse_qs(urlparse(url).query)
+    except ValueError:
+        return None
+    for key in EXPIRY_PARAMS:
+        value = (query.get(key) or [""])[0]
+        if value.isdigit() and len(value) >= 10:
+            return int(value[:10])
+    return None
+
+class UrlResolver:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # path -> {"raw_url", "sign", "provider", "expires_at"}
+        self._inflight = {}            # path -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.routes = {"direct": 0, "tunnel": 0}
+
+    def _expiry_for(self, data):
+        raw_url = data.get("raw_url") or ""
+        ttl = DRIVER_LINK_TTL.get(data.get("provider"), DEFAULT_LINK_TTL)
+        expires_at = time.time() + ttl
+        url_expiry = _url_expiry(raw_url) if raw_url.startswith("http") else None
+        if url_expiry: expires_at = min(expires_at, url_expiry)
+        return expires_at - EXPIRY_MARGIN
+
+    async def _fetch(self, path):
+        try:
+            info = await get_file_info(path)
+        finally:
+            # 在任务内部移除，结束后新的 lookup 不会再拿到这个 (可能失败的) 任务
+            self._inflight.pop(path, None)
+        if not info or info.get("code") != 200:
+            return None
+        data = info.get("data") or {}
+        entry = {
+            "raw_url": data.get("raw_url") or "",
+            "sign": data.get("sign") or "",
+            "provider": data.get("provider"),
+            "expires_at": self._expiry_for(data),
+        }
+        self._entries[path] = entry
+        self._entries.move_to_end(path)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def lookup(self, path, min_ttl=0):
+        """
+        返回缓存的 fs/get 信息，过期或缺失时重新获取 (同一路径并发只请求一次)
+        Args:
+            min_ttl: 缓存的直链至少还需有效的秒数，不足时重新获取
+        """
+        path = _normalize(path)
+        entry = self._entries.get(path)
+        if entry and entry["expires_at"] > time.time() + min_ttl:
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.create_task(self._fetch(path))
+            self._inflight[path] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            logger.warning(f"解析直链失败 {path}: {e}")
+            return None
+
+    async def _build(self, path, entry, base_url, tunnel=False):
+        raw_url = entry.get("raw_url", "")
+        # 公网直链: Runner 直接下载，不占用本机上行
+        # 本地 IP (未配置 Site URL) 或相对路径则只能走隧道
+        # 有效期不足以等到 Runner 启动的直链 (如刚签发就很短的链接) 同样改走隧道
+        fresh = entry.get("expires_at", 0) > time.time() + RUNNER_MIN_TTL
+        if not tunnel and fresh and raw_url.startswith("http") and not LOCAL_HOST_RE.search(raw_url):
+            url, route = raw_url, "direct"
+        else:
+            token = await get_token() or ""
+            url, route = f"{base_url}/d{signed_path(path, entry.get('sign'), token)}", "tunnel"
+        self.routes[route] += 1
+        return url, route
+
+    async def resolve(self, path, base_url):
+        """
+        供 Runner 访问的地址 (fs/get 失败时仍回退到隧道 /d 链接)
+        Returns:
+            (url, route) - route 为 "direct" (网盘直链) 或 "tunnel" (经隧道的 /d 链接)
+        """
+        path = _normalize(path)
+        entry = await self.lookup(path, RUNNER_MIN_TTL) or {}
+        return await self._build(path, entry, base_url)
+
+    async def resolve_many(self, paths, base_url, tunnel=False):
+        """
+        并发解析多个路径
+        Args:
+            tunnel: 只生成隧道 /d 链接 (长时间后才播放的条目，直链届时可能已过期)
+        Returns:
+            {path: (url, route)}，fs/get 失败的路径不在结果中
+        """
+        sem = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+
+        async def one(path):
+            async with sem:
+                entry = await self.lookup(path, 0 if tunnel else RUNNER_MIN_TTL)
+            if entry is None: return path, None
+            return path, await self._build(_normalize(path), entry, base_url, tunnel)
+
+        results = await asyncio.gather(*(one(p) for p in paths))
+        return {p: r for p, r in results if r}
+
+    async def resolve_local(self, path):
+        """本机可访问的地址 (ffprobe 用): 优先 raw_url，否则构造 127.0.0.1 的 /d 链接"""
+        path = _normalize(path)
+        entry = await self.lookup(path) or {}
+        raw_url = entry.get("raw_url", "")
+        if raw_url.startswith("http"): return raw_url
+        if raw_url: return f"{ALIST_API_URL}{raw_url}"
+        url = f"{ALIST_API_URL}/d{quote(path)}"
+        return f"{url}?sign={entry['sign']}" if entry.get("sign") else url
+
+    def invalidate(self, path):
+        self._entries.pop(_normalize(path), None)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            **self.routes,
+        }
+
+url_resolver = UrlResolver()
+
+def get_resolver_stats_text():
+    """用于状态面板的直链缓存统计"""
+    s = url_resolver.stats()
+    return f"🔗 直链缓存: `{s['entries']}` 项 | 命中 `{s['hits']}` | 未命中 `{s['misses']}` | 直链 `{s['direct']}` / 隧道 `{s['tunnel']}`"
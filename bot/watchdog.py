@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from .config import WATCHDOG_AUTO_RESTART
+
+logger = logging.getLogger(__name__)
+
+# --- 服务看门狗 ---
+# 并发探测本地端口，带迟滞的状态机，只在状态变化时告警
+
+# 服务名 -> (端口, pm2 进程名)
+SERVICES = {
+    "alist": (5244, "alist"),
+    "aria2c": (6800, "aria2"),
+    "cloudflared": (49500, "tunnel"),
+}
+
+PROBE_TIMEOUT = 1.0
+FAIL_THRESHOLD = 2     # 连续失败次数达到后才判定为宕机
+RECOVER_THRESHOLD = 1  # 连续成功次数达到后判定为恢复
+RESTART_COOLDOWN = 600 # 同一服务两次自动重启的最小间隔 (秒)
+
+async def probe_port(port, timeout=PROBE_TIMEOUT):
+    """异步检查本地端口是否可连接"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+        return True
+    except Exception:
+        return False
+
+async def probe_services():
+    """并发探测所有服务端口，返回 {服务名: bool}"""
+    names = list(SERVICES)
+    results = await asyncio.gather(*(probe_port(SERVICES[n][0]) for n in names))
+    return dict(zip(names, results))
+
+async def restart_service(pm2_name):
+    """异步执行 pm2 restart，不阻塞事件循环"""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "pm2", "restart", pm2_name,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        await asyncio.wait_for(proc.wait(), 30)
+        return proc.returncode == 0
+    except Exception as e:
+        logger.error(f"重启 {pm2_name} 失败: {e}")
+        return False
+
+class ServiceWatchdog:
+    def __init__(self):
+        self.state = {name: None for name in SERVICES}  # None=未知, True=正常, False=宕机
+        self._fails = {name: 0 for name in SERVICES}
+        self._oks = {name: 0 for name in SERVICES}
+        self._last_restart = {}
+
+    def update(self, results):
+        """
+        根据一次探测结果更新状态
+        Returns:
+            [(服务名, 新状态)] 仅包含发生变化的服务
+        """
+        changes = []
+        for name, ok in results.items():
+            if ok:
+                self._oks[name] += 1
+                self._fails[name] = 0
+                if self.state[name] is not True and self._oks[name] >= RECOVER_THRESHOLD:
+                    # 首次探测 (未知 -> 正常) 不算变化
+                    if self.state[name] is False: changes.append((name, True))
+                    self.state[name] = True
+            else:
+                self._fails[name] += 1
+                self._oks[name] = 0
+                if self.state[name] is not False and self._fails[name] >= FAIL_THRESHOLD:
+                    changes.append((name, False))
+                    self.state[name] = False
+        return changes
+
+    def should_restart(self, name):
+        last = self._last_restart.get(name, 0)
+        if time.monotonic() - last < RESTART_COOLDOWN: return False
+        self._last_restart[name] = time.monotonic()
+        return True
+
+    async def check(self):
+        """
+        执行一次检查
+        Returns:
+            需要推送的告警文本，无变化时为 None
+        """
+        changes = self.update(await probe_services())
+        if not changes: return None
+
+        lines = []
+        for name, up in changes:
+            if up:
+                lines.append(f"✅ `{name}` 已恢复")
+                continue
+            line = f"🚨 `{name}` 无响应 (端口 {SERVICES[name][0]})"
+            if WATCHDOG_AUTO_RESTART and self.should_restart(name):
+                ok = await restart_service(SERVICES[name][1])
+                line += "，已自动重启" if ok else "，自动重启失败"
+            lines.append(line)
+        return "*🩺 服务监控*\n" + "\n".join(lines)
+
+watchdog = ServiceWatchdog()
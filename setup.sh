@@ -59,7 +59,7 @@ echo -e "\033[1;36m>>> [3/5] 安装 Python 库...\033[0m"
 if [ -f "bot/requirements.txt" ]; then
     pip install -r bot/requirements.txt
 else
-    pip install python-telegram-bot requests psutil python-dotenv
+    pip install python-telegram-bot 'httpx[http2]' websockets psutil python-dotenv
 fi
 
 echo -e "\033[1;36m>>> [4/5] 安装 PM2 (进程守护)...\033[0m"